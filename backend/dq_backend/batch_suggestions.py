@@ -0,0 +1,60 @@
+import asyncio
+import os
+from utils import aget_rule_suggestion_on_column, get_columns_of_table, get_schema_of_table, get_profile_of_table
+from precompute import get_precomputed_suggestion
+from concurrency import ai_limiter, LimitExceeded
+
+# ------------------------------------------ batch rule suggestions ----------------------------------------------
+# Suggests rules for many columns of one table at once. The schema and profile are fetched
+# once up front (the per-column calls then hit the catalog/profile caches), columns fan out
+# with at most BATCH_SUGGESTION_CONCURRENCY in flight, and results are yielded in the order
+# they complete so the client can show them as they arrive.
+
+BATCH_SUGGESTION_CONCURRENCY = int(os.getenv("BATCH_SUGGESTION_CONCURRENCY", "4"))
+
+
+def _prepare_batch(table_name, column_names):
+    columns = get_columns_of_table(table_name)
+    if not columns:
+        return None, []
+    get_schema_of_table(table_name)
+    get_profile_of_table(table_name)
+    if column_names is None:
+        return columns, []
+    unknown = [column for column in column_names if column not in columns]
+    return [column for column in column_names if column in columns], unknown
+
+
+async def _suggest_column(table_name, column_name, use_cache, semaphore):
+    async with semaphore:
+        try:
+            if use_cache:
+                precomputed = await asyncio.to_thread(get_precomputed_suggestion, table_name, column_name)
+                if precomputed is not None:
+                    return {"column_name": column_name, "suggested_rule": precomputed["suggested_rule"], "precomputed": True}
+            async with ai_limiter:
+                suggested_rule = await aget_rule_suggestion_on_column(column_name, table_name, [], use_cache)
+            return {"column_name": column_name, "suggested_rule": suggested_rule, "precomputed": False}
+        except LimitExceeded as e:
+            return {"column_name": column_name, "error": str(e)}
+        except Exception as e:
+            return {"column_name": column_name, "error": f"{type(e).__name__}: {e}"}
+
+
+# Returns the columns to suggest for (None if the table doesn't exist) and the unknown ones
+async def prepare_rule_suggestions_batch(table_name, column_names=None):
+    return await asyncio.to_thread(_prepare_batch, table_name, column_names)
+
+
+# Yields one result dict per column as soon as it is ready; one failing column doesn't stop the rest
+async def astream_rule_suggestions(table_name, columns, use_cache=True, max_concurrency=BATCH_SUGGESTION_CONCURRENCY):
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [asyncio.create_task(_suggest_column(table_name, column, use_cache, semaphore)) for column in columns]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away: cancelling the tasks cancels their model calls too, except ones
+        # another request is also waiting on through single_flight
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1 @@
+# Benchmarks for the data access and rule paths at synthetic scale, see run.py
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+# ------------------------------------------ load driver ----------------------------------------------
+# Replays a mix of table browsing, rule conversion and chat traffic against the API with a
+# fixed number of concurrent clients, and reports p50/p95/p99 latency and throughput per
+# kind of request. Run it against a server started with LLM_PROVIDER=fake to stay offline,
+# or in-process (--in-process, no server needed; the fake LLM is then the default):
+#
+#   LLM_PROVIDER=fake uvicorn main:app --workers 1 &
+#   python -m benchmarks.load --duration 60 --concurrency 32 --mix table=70,convert=20,chat=10
+#   python -m benchmarks.load --in-process --duration 30
+
+TABLE = "conventional_power_plants_DE"
+COLUMNS = ["postcode", "city", "capacity_net_bnetza", "energy_source", "commissioned", "lat", "status"]
+RULES = [
+    "there should not be a null value",
+    "must be exactly 5 characters",
+    "must not be negative",
+    "should be between 1900 and 2030",
+    "values should be unique",
+    "should look like a plausible value for a German power plant",
+]
+CHAT_INPUTS = [
+    "What does this column contain?",
+    "How many values are missing?",
+    "Suggest a rule for this column",
+    "What are the most common values?",
+]
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"table", "convert", "chat"}
+    if unknown:
+        raise SystemExit(f"Unknown request kinds in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class Client:
+    def __init__(self, http, rng, args):
+        self.http = http
+        self.rng = rng
+        self.args = args
+        self.session_id = None
+
+    async def table(self):
+        offset = self.rng.randrange(0, max(1, self.args.max_offset))
+        return await self.http.post("/get_table_data/", json={"table_name": TABLE, "offset": offset, "limit": 100})
+
+    async def convert(self):
+        body = {
+            "table_name": TABLE,
+            "column_name": self.rng.choice(COLUMNS),
+            "rule": self.rng.choice(RULES),
+            "use_cache": not self.args.no_cache,
+        }
+        return await self.http.post("/convert_rule_to_sql/", json=body)
+
+    async def chat(self):
+        body = {
+            "table_name": TABLE,
+            "column_name": self.rng.choice(COLUMNS),
+            "user_input": self.rng.choice(CHAT_INPUTS),
+            "session_id": self.session_id,
+        }
+        response = await self.http.post("/chatbot/", json=body)
+        if response.status_code == 200:
+            # Keep talking in the same session, like a user would
+            self.session_id = response.json().get("session_id")
+        return response
+
+
+async def worker(client, kinds, weights, deadline, results):
+    while time.perf_counter() < deadline:
+        kind = client.rng.choices(kinds, weights=weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await getattr(client, kind)()
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        results.append((kind, status, time.perf_counter() - started))
+
+
+def report(results, elapsed):
+    summary = {}
+    for kind in sorted({kind for kind, _, _ in results}):
+        latencies = sorted(latency for k, _, latency in results if k == kind)
+        statuses = {}
+        for k, status, _ in results:
+            if k == kind:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[kind] = {
+            "requests": len(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1),
+            "statuses": statuses,
+        }
+    return {"elapsed_s": round(elapsed, 2), "requests": len(results), "throughput_rps": round(len(results) / elapsed, 2), "kinds": summary}
+
+
+async def run(args):
+    import httpx
+
+    if args.in_process:
+        os.environ.setdefault("LLM_PROVIDER", "fake")
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://in-process"
+    else:
+        transport = None
+        base_url = args.base_url
+
+    mix = parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, timeout=args.timeout, limits=limits) as http:
+        clients = [Client(http, random.Random(args.seed + i), args) for i in range(args.concurrency)]
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(client, kinds, weights, deadline, results) for client in clients))
+        elapsed = time.perf_counter() - started
+    return report(results, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay mixed API traffic and report latency percentiles and throughput")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--in-process", action="store_true", help="drive main.app directly instead of a server")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--mix", default="table=70,convert=20,chat=10", help="request kinds and weights")
+    parser.add_argument("--max-offset", type=int, default=900, help="highest row offset for table pages")
+    parser.add_argument("--no-cache", action="store_true", help="send use_cache=false so conversions reach the agent")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "settings": {k: v for k, v in vars(args).items() if k != "out"},
+        **result,
+    }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from benchmarks.synth import SCALES, dataset_path, generate_table
+
+# ------------------------------------------ benchmark runner ----------------------------------------------
+# Times the data access and rule paths of utils.py on synthetic copies of the power plant
+# table at several scales and writes one JSON file per run, named after the git commit, so
+# runs can be compared with --compare. Each scale runs in its own process, since utils.py
+# binds its engines to DQ_DB_PATH_SOURCE / DQ_RULES_DATA_PATH at import time.
+#
+#   cd backend/dq_backend
+#   python -m benchmarks.run --scales 10k,1m
+#   python -m benchmarks.run --compare benchmarks/results/old.json benchmarks/results/new.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DB = os.path.join(HERE, "..", "..", "data", "source_data", "conventional_power_plants", "conventional_power_plants.sqlite")
+TABLE = "conventional_power_plants_DE"
+
+# Stored rules used by the rule execution cases, in the normalized rowid form
+RULES = [
+    ("postcode has 5 characters", "postcode", "error", f'SELECT rowid FROM "{TABLE}" WHERE LENGTH("postcode") != 5'),
+    ("capacity is not negative", "capacity_net_bnetza", "error", f'SELECT rowid FROM "{TABLE}" WHERE CAST("capacity_net_bnetza" AS REAL) < 0'),
+    ("energy source is not null", "energy_source", "warning", f'SELECT rowid FROM "{TABLE}" WHERE "energy_source" IS NULL'),
+    ("latitude lies in Germany", "lat", "info", f'SELECT rowid FROM "{TABLE}" WHERE CAST("lat" AS REAL) NOT BETWEEN 47 AND 55.1'),
+    ("id is unique", "id", "info", f'SELECT rowid FROM "{TABLE}" WHERE "id" IN (SELECT "id" FROM "{TABLE}" WHERE "id" IS NOT NULL GROUP BY "id" HAVING COUNT(*) > 1)'),
+]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def time_case(fn, repeat):
+    fn()  # warm up caches the way a running server would have them
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+def prepare_rules_dir(rules_dir):
+    os.makedirs(rules_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(rules_dir, "rule_management.sqlite"))
+    try:
+        conn.execute("DROP TABLE IF EXISTS rule_storage")
+        conn.execute("""
+            CREATE TABLE rule_storage (
+                rule_id TEXT PRIMARY KEY,
+                rule TEXT,
+                table_name TEXT,
+                column_name TEXT,
+                rule_category TEXT CHECK(rule_category IN ('info', 'error', 'warning')),
+                sql_query TEXT
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO rule_storage VALUES (?, ?, ?, ?, ?, ?)",
+            [(f"bench_{i:03d}", rule, TABLE, column, category, sql) for i, (rule, column, category, sql) in enumerate(RULES)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# Runs inside the per-scale process, with utils.py pointed at the synthetic database
+def run_cases(rows, repeat):
+    from utils import load_table_values, load_col_values, get_top_values, get_query_test_results, encode_page_cursor
+    from rule_engine import run_rules_on_table
+
+    last_page = max(0, rows - 100)
+    cases = {
+        "load_table_values.first_page": lambda: load_table_values(TABLE, 0, 100),
+        "load_table_values.last_page_offset": lambda: load_table_values(TABLE, last_page, 100),
+        "load_table_values.last_page_cursor": lambda: load_table_values(TABLE, 0, 100, encode_page_cursor(last_page)),
+        "load_col_values.first_1000": lambda: load_col_values(TABLE, "postcode", 0, 1000),
+        "load_col_values.last_1000_cursor": lambda: load_col_values(TABLE, "postcode", 0, 1000, encode_page_cursor(max(0, rows - 1000))),
+        "get_top_values.text": lambda: get_top_values(TABLE, "city"),
+        "get_top_values.real": lambda: get_top_values(TABLE, "capacity_net_bnetza"),
+        "get_query_test_results.length": lambda: get_query_test_results(RULES[0][3], "postcode", TABLE),
+        "get_query_test_results.subquery": lambda: get_query_test_results(RULES[4][3], "id", TABLE),
+        "run_rules_on_table": lambda: run_rules_on_table(TABLE),
+        "run_rules_on_table.with_rows": lambda: run_rules_on_table(TABLE, True),
+    }
+    return {name: time_case(fn, repeat) for name, fn in cases.items()}
+
+
+def run_scale(scale, args):
+    rows = SCALES[scale]
+    os.makedirs(args.data_dir, exist_ok=True)
+    db_path = dataset_path(args.data_dir, rows, args.null_rate, args.bad_rate, args.seed)
+    generated_in = None
+    if not os.path.exists(db_path):
+        started = time.perf_counter()
+        generate_table(db_path, rows, args.source_db, TABLE, null_rate=args.null_rate, bad_rate=args.bad_rate, seed=args.seed)
+        generated_in = round(time.perf_counter() - started, 2)
+
+    rules_dir = os.path.join(args.data_dir, f"rules_{scale}")
+    prepare_rules_dir(rules_dir)
+    # No case calls the model; the fake provider keeps the worker from needing an API key
+    env = {**os.environ, "DQ_DB_PATH_SOURCE": db_path, "DQ_RULES_DATA_PATH": rules_dir, "LLM_PROVIDER": "fake"}
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.run", "--worker", "--rows", str(rows), "--repeat", str(args.repeat)],
+        cwd=os.path.dirname(HERE), env=env, text=True,
+    )
+    return {
+        "rows": rows,
+        "dataset": os.path.basename(db_path),
+        "generated_in_s": generated_in,
+        "cases": json.loads(output.strip().splitlines()[-1]),
+    }
+
+
+# Print median change per case between two result files
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'scale':<6} {'case':<40} {old['commit']:>12} {new['commit']:>12} {'change':>8}")
+    for scale, result in new["scales"].items():
+        old_cases = old["scales"].get(scale, {}).get("cases", {})
+        for case, stats in result["cases"].items():
+            if case not in old_cases:
+                continue
+            before, after = old_cases[case]["median_ms"], stats["median_ms"]
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            print(f"{scale:<6} {case:<40} {before:>10.3f}ms {after:>10.3f}ms {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data access and rule execution at synthetic scale")
+    parser.add_argument("--scales", default="10k,1m", help=f"comma separated, any of {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--null-rate", type=float, default=None, help="NULL rate of every column (default: as in the source)")
+    parser.add_argument("--bad-rate", type=float, default=0.01, help="share of non-null values replaced by bad values")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--source-db", default=SOURCE_DB)
+    parser.add_argument("--data-dir", default=os.path.join(HERE, "data"))
+    parser.add_argument("--out", default=None, help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.worker:
+        print(json.dumps(run_cases(args.rows, args.repeat)))
+        return
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "settings": {"repeat": args.repeat, "null_rate": args.null_rate, "bad_rate": args.bad_rate, "seed": args.seed},
+        "scales": {},
+    }
+    for scale in args.scales.split(","):
+        scale = scale.strip().lower()
+        print(f"Running {scale} ...", file=sys.stderr)
+        results["scales"][scale] = run_scale(scale, args)
+
+    out = args.out or os.path.join(HERE, "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
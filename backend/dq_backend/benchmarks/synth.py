@@ -0,0 +1,110 @@
+import os
+import random
+import sqlite3
+
+# ------------------------------------------ synthetic data ----------------------------------------------
+# Builds a table with the schema of a real one and values drawn from the real value
+# distributions, at any number of rows. null_rate and bad_rate control data quality:
+# null_rate of every column's values are NULL (None keeps each column's own null rate) and
+# bad_rate of the non-null values are replaced by values a typical rule should flag
+# (negative numbers, wrong-length or garbage text). Same seed, same table.
+
+BATCH_ROWS = 50_000
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+# Per column: declared type, non-null values with cumulative weights, null rate, and whether values are near-unique
+def column_distributions(source_path, table_name):
+    conn = sqlite3.connect(source_path)
+    try:
+        columns = conn.execute(f"PRAGMA table_info({_quote(table_name)})").fetchall()
+        total = conn.execute(f"SELECT COUNT(*) FROM {_quote(table_name)}").fetchone()[0]
+        distributions = []
+        for _, name, col_type, *_ in columns:
+            counts = conn.execute(
+                f"SELECT {_quote(name)}, COUNT(*) FROM {_quote(table_name)} GROUP BY 1 ORDER BY 2 DESC"
+            ).fetchall()
+            nulls = sum(count for value, count in counts if value is None)
+            values = [(value, count) for value, count in counts if value is not None]
+            cum_weights, running = [], 0
+            for _, count in values:
+                running += count
+                cum_weights.append(running)
+            distributions.append({
+                "name": name,
+                "type": (col_type or "TEXT").upper(),
+                "values": [value for value, _ in values],
+                "cum_weights": cum_weights,
+                "null_rate": nulls / total if total else 0.0,
+                "unique": total > 0 and len(values) >= 0.9 * (total - nulls),
+            })
+        return columns, distributions
+    finally:
+        conn.close()
+
+
+def _bad_value(column, value, rng):
+    if isinstance(value, (int, float)):
+        return -abs(value) * 10 - 1
+    choice = rng.random()
+    if choice < 0.3:
+        return ""
+    if choice < 0.6:
+        return str(value) + "#" * rng.randint(1, 4)
+    return str(value)[: max(1, len(str(value)) // 2)]
+
+
+def _column_batch(column, start, size, null_rate, bad_rate, rng):
+    if column["values"]:
+        batch = rng.choices(column["values"], cum_weights=column["cum_weights"], k=size)
+    else:
+        batch = [None] * size
+    if column["unique"]:
+        # Keep near-unique columns (ids, names) near-unique at any scale
+        batch = [f"{value}-{start + i}" if isinstance(value, str) else value for i, value in enumerate(batch)]
+    elif column["type"] == "REAL" and len(column["values"]) > 50:
+        # Continuous columns: jitter so the distinct count grows with the row count
+        batch = [value * (1 + rng.uniform(-0.01, 0.01)) if isinstance(value, (int, float)) else value for value in batch]
+    rate = column["null_rate"] if null_rate is None else null_rate
+    for i in rng.sample(range(size), round(size * bad_rate)):
+        if batch[i] is not None:
+            batch[i] = _bad_value(column, batch[i], rng)
+    for i in rng.sample(range(size), round(size * rate)):
+        batch[i] = None
+    return batch
+
+
+def dataset_path(data_dir, rows, null_rate, bad_rate, seed):
+    null_part = "src" if null_rate is None else f"{null_rate:g}"
+    return os.path.join(data_dir, f"synthetic_{rows}_n{null_part}_b{bad_rate:g}_s{seed}.sqlite")
+
+
+# Write `rows` synthetic rows into table_name of a new SQLite file at target_path
+def generate_table(target_path, rows, source_path, source_table, table_name=None, null_rate=None, bad_rate=0.01, seed=42):
+    table_name = table_name or source_table
+    columns, distributions = column_distributions(source_path, source_table)
+    rng = random.Random(seed)
+
+    tmp_path = target_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        column_defs = ", ".join(f"{_quote(name)} {col_type}" for _, name, col_type, *_ in columns)
+        conn.execute(f"CREATE TABLE {_quote(table_name)} ({column_defs})")
+        insert = f"INSERT INTO {_quote(table_name)} VALUES ({', '.join('?' for _ in columns)})"
+        for start in range(0, rows, BATCH_ROWS):
+            size = min(BATCH_ROWS, rows - start)
+            batch = [_column_batch(column, start, size, null_rate, bad_rate, rng) for column in distributions]
+            conn.executemany(insert, zip(*batch))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, target_path)
+    return target_path
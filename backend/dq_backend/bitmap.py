@@ -0,0 +1,223 @@
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+# ------------------------------------------ row bitmaps ----------------------------------------------
+# Roaring-style compressed set of row ids. Ids are split on their high 16 bits into
+# containers. A container holding few ids is a sorted array of the low 16 bits, a
+# dense one is a 65536-bit bitset (stored as a python int so AND/OR/ANDNOT and
+# popcount run in C).
+
+ARRAY_MAX = 4096
+_BITSET_BYTES = 65536 // 8
+_MAGIC = b"RBM1"
+_ARRAY, _BITSET = 0, 1
+
+# Low bit positions set in every byte value, used to expand bitsets back to ids
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def _array_to_bitset(values):
+    bits = bytearray(_BITSET_BYTES)
+    for value in values:
+        bits[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _bitset_to_array(bitset):
+    values = array("H")
+    data = bitset.to_bytes(_BITSET_BYTES, "little")
+    for index, byte in enumerate(data):
+        if byte:
+            base = index << 3
+            values.extend(base + bit for bit in _BYTE_BITS[byte])
+    return values
+
+
+def _cardinality(container):
+    return container.bit_count() if isinstance(container, int) else len(container)
+
+
+def _normalize(container):
+    """Pick the cheaper representation for a container, None when it is empty."""
+    if isinstance(container, int):
+        count = container.bit_count()
+        if count == 0:
+            return None
+        return _bitset_to_array(container) if count <= ARRAY_MAX else container
+    if not container:
+        return None
+    return _array_to_bitset(container) if len(container) > ARRAY_MAX else container
+
+
+def _as_bitset(container):
+    return container if isinstance(container, int) else _array_to_bitset(container)
+
+
+class RowBitmap:
+    def __init__(self, values=()):
+        self._containers = {}
+        self.update(values)
+
+    # ------------------------------ building ------------------------------
+
+    def add(self, value):
+        key, low = value >> 16, value & 0xFFFF
+        container = self._containers.get(key)
+        if container is None:
+            self._containers[key] = array("H", [low])
+        elif isinstance(container, int):
+            self._containers[key] = container | (1 << low)
+        else:
+            pos = bisect_left(container, low)
+            if pos == len(container) or container[pos] != low:
+                container.insert(pos, low)
+                if len(container) > ARRAY_MAX:
+                    self._containers[key] = _array_to_bitset(container)
+
+    def update(self, values):
+        # Set bits per container first, so bulk loads don't pay for sorted inserts
+        pending = {}
+        for value in values:
+            key = value >> 16
+            bits = pending.get(key)
+            if bits is None:
+                bits = pending[key] = bytearray(_BITSET_BYTES)
+            bits[(value >> 3) & 0x1FFF] |= 1 << (value & 7)
+        for key, bits in pending.items():
+            bitset = int.from_bytes(bits, "little")
+            container = self._containers.get(key)
+            if container is not None:
+                bitset |= _as_bitset(container)
+            self._containers[key] = _normalize(bitset)
+
+    # ------------------------------ queries ------------------------------
+
+    def __len__(self):
+        return sum(_cardinality(c) for c in self._containers.values())
+
+    def __bool__(self):
+        return bool(self._containers)
+
+    def __contains__(self, value):
+        container = self._containers.get(value >> 16)
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        pos = bisect_left(container, low)
+        return pos < len(container) and container[pos] == low
+
+    def __iter__(self):
+        for key in sorted(self._containers):
+            container = self._containers[key]
+            lows = _bitset_to_array(container) if isinstance(container, int) else container
+            base = key << 16
+            for low in lows:
+                yield base + low
+
+    def __eq__(self, other):
+        if not isinstance(other, RowBitmap):
+            return NotImplemented
+        return self._containers.keys() == other._containers.keys() and all(
+            _as_bitset(c) == _as_bitset(other._containers[k]) for k, c in self._containers.items()
+        )
+
+    def __repr__(self):
+        return f"RowBitmap(cardinality={len(self)}, containers={len(self._containers)})"
+
+    # Page through ids in ascending order, skipping whole containers by their cardinality
+    def slice(self, offset, limit):
+        out = []
+        for key in sorted(self._containers):
+            if len(out) >= limit:
+                break
+            container = self._containers[key]
+            count = _cardinality(container)
+            if offset >= count:
+                offset -= count
+                continue
+            lows = _bitset_to_array(container) if isinstance(container, int) else container
+            base = key << 16
+            take = lows[offset:offset + limit - len(out)]
+            out.extend(base + low for low in take)
+            offset = 0
+        return out
+
+    # ------------------------------ set algebra ------------------------------
+
+    def _combine(self, other, keys, op):
+        result = RowBitmap()
+        for key in keys:
+            left = self._containers.get(key)
+            right = other._containers.get(key)
+            if left is None or right is None:
+                # Only OR keeps a container missing on one side, ANDNOT keeps its left side
+                container = left if op == "andnot" else (left if right is None else right)
+                if op != "and" and container is not None:
+                    result._containers[key] = container if isinstance(container, int) else array("H", container)
+                continue
+            if op == "and" and not isinstance(left, int) and not isinstance(right, int):
+                merged = array("H", sorted(set(left).intersection(right)))
+            elif op == "and":
+                merged = _as_bitset(left) & _as_bitset(right)
+            elif op == "or":
+                merged = _as_bitset(left) | _as_bitset(right)
+            else:
+                merged = _as_bitset(left) & ~_as_bitset(right)
+            merged = _normalize(merged)
+            if merged is not None:
+                result._containers[key] = merged
+        return result
+
+    def __and__(self, other):
+        return self._combine(other, self._containers.keys() & other._containers.keys(), "and")
+
+    def __or__(self, other):
+        return self._combine(other, self._containers.keys() | other._containers.keys(), "or")
+
+    def __sub__(self, other):
+        return self._combine(other, self._containers.keys(), "andnot")
+
+    andnot = __sub__
+
+    # ------------------------------ serialization ------------------------------
+
+    def to_bytes(self):
+        parts = [_MAGIC, struct.pack("<I", len(self._containers))]
+        for key in sorted(self._containers):
+            container = self._containers[key]
+            if isinstance(container, int):
+                parts.append(struct.pack("<IBI", key, _BITSET, container.bit_count()))
+                parts.append(container.to_bytes(_BITSET_BYTES, "little"))
+            else:
+                parts.append(struct.pack("<IBI", key, _ARRAY, len(container)))
+                values = array("H", container)
+                if sys.byteorder == "big":
+                    values.byteswap()
+                parts.append(values.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != _MAGIC:
+            raise ValueError("Not a serialized RowBitmap")
+        bitmap = cls()
+        (count,) = struct.unpack_from("<I", data, 4)
+        pos = 8
+        for _ in range(count):
+            key, kind, cardinality = struct.unpack_from("<IBI", data, pos)
+            pos += struct.calcsize("<IBI")
+            if kind == _BITSET:
+                bitmap._containers[key] = int.from_bytes(data[pos:pos + _BITSET_BYTES], "little")
+                pos += _BITSET_BYTES
+            else:
+                values = array("H")
+                values.frombytes(data[pos:pos + 2 * cardinality])
+                if sys.byteorder == "big":
+                    values.byteswap()
+                bitmap._containers[key] = values
+                pos += 2 * cardinality
+        return bitmap
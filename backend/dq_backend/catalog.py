@@ -0,0 +1,121 @@
+import hashlib
+import re
+import threading
+from langchain_community.utilities.sql_database import SQLDatabase
+from data_access import quote_identifier, fetch_all, fetch_scalar
+from connections import file_version
+
+# ------------------------------------------ catalog cache ----------------------------------------------
+# In-process cache of table names, column metadata and the rendered schema text that
+# is put into prompts. SQLite bumps PRAGMA schema_version on every DDL change, and the
+# data version (see _data_version) changes on every commit, so reading those two is
+# enough to know whether anything cached is stale. table_version narrows that down to
+# one table for the caches keyed per table (profiles, precomputed suggestions).
+
+
+class Catalog:
+    def __init__(self, engine, sample_rows_in_table_info=3, db_path=None):
+        self.engine = engine
+        self.db_path = db_path
+        self.sample_rows_in_table_info = sample_rows_in_table_info
+        self._lock = threading.RLock()
+        self._schema_version = None
+        self._last_data_version = None
+        self._db = None
+        self._tables = None
+        self._columns = {}
+        self._schema_text = {}
+        self._table_versions = {}
+
+    # Drop whatever the current schema/data versions made stale
+    def _check_versions(self):
+        schema_version = fetch_scalar(self.engine, "PRAGMA schema_version")
+        data_version = self._data_version()
+        if schema_version != self._schema_version:
+            self._db = None
+            self._tables = None
+            self._columns = {}
+            self._schema_text = {}
+            self._table_versions = {}
+        elif data_version != self._last_data_version:
+            # Schema text embeds sample rows, so it also depends on the data
+            self._schema_text = {}
+            self._table_versions = {}
+        self._schema_version = schema_version
+        self._last_data_version = data_version
+
+    # With a db_path the file version covers writes from any connection (needed for pooled
+    # engines, where data_version differs per connection); without one PRAGMA data_version
+    # covers commits from other connections and total_changes() the engine's own
+    def _data_version(self):
+        if self.db_path is not None:
+            return file_version(self.db_path)
+        return fetch_scalar(self.engine, "PRAGMA data_version"), fetch_scalar(self.engine, "SELECT total_changes()")
+
+    # Changes whenever the schema or any data changes
+    def version(self):
+        return fetch_scalar(self.engine, "PRAGMA schema_version"), self._data_version()
+
+    # Short token for the contents of one table, None if there is no such table: its CREATE
+    # statement, row count and max rowid. Writes to other tables leave it alone; it is only
+    # recomputed after version() moved, so the COUNT runs once per change, not per call.
+    # An in-place UPDATE that keeps the count and max rowid isn't seen (profile with refresh)
+    def table_version(self, table_name):
+        with self._lock:
+            if table_name not in self.list_tables():
+                return None
+            if table_name not in self._table_versions:
+                self._table_versions[table_name] = self._fingerprint(table_name)
+            return self._table_versions[table_name]
+
+    def _fingerprint(self, table_name):
+        create_sql = fetch_scalar(self.engine, "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+        without_rowid = re.search(r"\bWITHOUT\s+ROWID\s*;?\s*$", create_sql or "", re.IGNORECASE)
+        aggregates = "COUNT(*)" if without_rowid else "COUNT(*), MAX(rowid)"
+        counts = fetch_all(self.engine, f"SELECT {aggregates} FROM {quote_identifier(table_name)}")[0]
+        return hashlib.sha1(repr((table_name, create_sql, tuple(counts))).encode()).hexdigest()[:16]
+
+    def invalidate(self):
+        with self._lock:
+            self._schema_version = None
+            self._check_versions()
+
+    # SQLDatabase wrapper, reflected once per schema version
+    def sql_database(self):
+        with self._lock:
+            self._check_versions()
+            if self._db is None:
+                self._db = SQLDatabase(self.engine, sample_rows_in_table_info=self.sample_rows_in_table_info)
+            return self._db
+
+    def list_tables(self):
+        with self._lock:
+            self._check_versions()
+            if self._tables is None:
+                self._tables = [
+                    row[0] for row in fetch_all(
+                        self.engine,
+                        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name",
+                    )
+                ]
+            return list(self._tables)
+
+    # Rows of PRAGMA table_info: (cid, name, type, notnull, dflt_value, pk)
+    def columns(self, table_name):
+        with self._lock:
+            self._check_versions()
+            if table_name not in self._columns:
+                self._columns[table_name] = fetch_all(self.engine, f"PRAGMA table_info({quote_identifier(table_name)})")
+            return list(self._columns[table_name])
+
+    def column_names(self, table_name):
+        return [col[1] for col in self.columns(table_name)]
+
+    # Same text as the sql_db_schema tool: CREATE TABLE statement plus a few sample rows
+    def schema_text(self, table_name):
+        table_name = table_name.strip()
+        with self._lock:
+            db = self.sql_database()
+            if table_name not in self._schema_text:
+                self._schema_text[table_name] = db.get_table_info_no_throw([table_name])
+            return self._schema_text[table_name]
@@ -0,0 +1,91 @@
+import json
+import os
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+# ------------------------------------------ chat history management ----------------------------------------------
+# Keeps the chatbot prompt bounded as a conversation grows:
+#   - once a thread has more than 2 * CHAT_KEEP_TURNS turns, everything but the last
+#     CHAT_KEEP_TURNS turns is folded into a running summary and removed from the state
+#   - tool outputs (raw SQL results) are cut to CHAT_TOOL_OUTPUT_CHARS in the prompt
+#   - each call is held to CHAT_TOKEN_BUDGET estimated tokens by dropping the oldest
+#     whole turns, so a tool result never loses the tool call it answers
+# A turn starts at a user message and runs up to the next one.
+
+CHAT_KEEP_TURNS = int(os.getenv("CHAT_KEEP_TURNS", "4"))
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "8000"))
+CHAT_TOOL_OUTPUT_CHARS = int(os.getenv("CHAT_TOOL_OUTPUT_CHARS", "2000"))
+
+
+def _text(content):
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+# Rough token count (~4 characters per token); good enough for a budget, and free unlike a tokenizer call
+def estimate_tokens(messages):
+    chars = 0
+    for message in messages:
+        chars += len(_text(message.content))
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            chars += len(tool_call["name"]) + len(json.dumps(tool_call["args"], default=str))
+    return chars // 4 + 4 * len(messages)
+
+
+def split_turns(messages):
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def truncate_tool_output(message, max_chars=CHAT_TOOL_OUTPUT_CHARS):
+    content = _text(message.content)
+    if not isinstance(message, ToolMessage) or len(content) <= max_chars:
+        return message
+    return message.model_copy(update={"content": content[:max_chars] + f"\n... [{len(content) - max_chars} characters cut]"})
+
+
+# Messages older than the last CHAT_KEEP_TURNS turns, or [] while the thread is still short
+def messages_to_summarize(messages, keep_turns=CHAT_KEEP_TURNS):
+    turns = split_turns(messages)
+    if len(turns) <= 2 * keep_turns:
+        return []
+    return [message for turn in turns[:-keep_turns] for message in turn]
+
+
+# Plain text transcript of messages for the summarizer
+def transcript(messages, max_tool_chars=CHAT_TOOL_OUTPUT_CHARS):
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {_text(message.content)}")
+        elif isinstance(message, AIMessage):
+            for tool_call in message.tool_calls or []:
+                lines.append(f"Assistant called {tool_call['name']}({json.dumps(tool_call['args'], default=str)})")
+            if _text(message.content):
+                lines.append(f"Assistant: {_text(message.content)}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool {message.name} returned: {_text(truncate_tool_output(message, max_tool_chars).content)}")
+    return "\n".join(lines)
+
+
+# Fit the conversation into the budget left after the system prompt; returns (messages, stats)
+def fit_to_budget(messages, reserved_tokens=0, budget=CHAT_TOKEN_BUDGET):
+    tokens_before = estimate_tokens(messages) + reserved_tokens
+    turns = [[truncate_tool_output(message) for message in turn] for turn in split_turns(messages)]
+    tokens = [estimate_tokens(turn) for turn in turns]
+    while len(turns) > 1 and sum(tokens) + reserved_tokens > budget:
+        turns.pop(0)
+        tokens.pop(0)
+    fitted = [message for turn in turns for message in turn]
+    stats = {
+        "messages_before": len(messages),
+        "messages_after": len(fitted),
+        "tokens_before": tokens_before,
+        "tokens_after": sum(tokens) + reserved_tokens,
+        "token_budget": budget,
+    }
+    return fitted, stats
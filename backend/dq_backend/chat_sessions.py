@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+# ------------------------------------------ chat sessions ----------------------------------------------
+# Chatbot conversations are checkpointed per session (thread_id) in their own SQLite file
+# instead of one shared in-memory thread. The store stays bounded:
+#   - only the newest CHAT_KEEP_CHECKPOINTS checkpoints of a thread are kept (each one
+#     holds the whole conversation, older ones are only useful for time travel)
+#   - threads idle for more than CHAT_THREAD_TTL_SECONDS are deleted
+#   - beyond CHAT_MAX_THREADS threads, the least recently used are deleted
+# Eviction runs every CHAT_EVICT_EVERY turns.
+
+CHAT_THREAD_TTL_SECONDS = int(os.getenv("CHAT_THREAD_TTL_SECONDS", str(24 * 3600)))
+CHAT_MAX_THREADS = int(os.getenv("CHAT_MAX_THREADS", "1000"))
+CHAT_KEEP_CHECKPOINTS = int(os.getenv("CHAT_KEEP_CHECKPOINTS", "2"))
+CHAT_EVICT_EVERY = int(os.getenv("CHAT_EVICT_EVERY", "50"))
+
+
+# SqliteSaver only implements the sync interface; the async one (used by ainvoke/astream)
+# runs the same calls in a worker thread, the saver's own lock keeps them serialized.
+class ChatCheckpointer(SqliteSaver):
+    def __init__(self, conn, **kwargs):
+        super().__init__(conn, **kwargs)
+        self._turns = 0
+        self._turns_lock = threading.Lock()
+        self._threads_ready = False
+
+    @classmethod
+    def from_path(cls, db_path):
+        return cls(sqlite3.connect(db_path, check_same_thread=False))
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        checkpoints = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def _ensure_threads(self):
+        if self._threads_ready:
+            return
+        self.setup()
+        with self.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS chat_threads (
+                    thread_id TEXT PRIMARY KEY,
+                    created_at REAL,
+                    last_used_at REAL,
+                    turns INTEGER DEFAULT 0
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS ix_chat_threads_last_used_at ON chat_threads (last_used_at)")
+        self._threads_ready = True
+
+    # Record a turn on a thread, trim its old checkpoints and now and then evict idle threads
+    def touch_thread(self, thread_id):
+        self._ensure_threads()
+        now = time.time()
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT INTO chat_threads (thread_id, created_at, last_used_at, turns) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(thread_id) DO UPDATE SET last_used_at = excluded.last_used_at, turns = turns + 1",
+                (thread_id, now, now),
+            )
+            self._trim_checkpoints(cur, thread_id)
+        with self._turns_lock:
+            self._turns += 1
+            evict = self._turns % CHAT_EVICT_EVERY == 0
+        if evict:
+            self.evict_threads()
+
+    def _trim_checkpoints(self, cur, thread_id):
+        cur.execute(
+            """
+            DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id NOT IN (
+                SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? ORDER BY checkpoint_id DESC LIMIT ?
+            )
+            """,
+            (thread_id, thread_id, CHAT_KEEP_CHECKPOINTS),
+        )
+        cur.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id NOT IN (SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?)",
+            (thread_id, thread_id),
+        )
+
+    def _delete_threads(self, cur, thread_ids):
+        for thread_id in thread_ids:
+            cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            cur.execute("DELETE FROM chat_threads WHERE thread_id = ?", (thread_id,))
+
+    def delete_session(self, thread_id):
+        self._ensure_threads()
+        with self.cursor() as cur:
+            self._delete_threads(cur, [thread_id])
+
+    # Drop threads idle past the TTL, then the least recently used ones above CHAT_MAX_THREADS
+    def evict_threads(self, ttl_seconds=CHAT_THREAD_TTL_SECONDS, max_threads=CHAT_MAX_THREADS):
+        self._ensure_threads()
+        with self.cursor() as cur:
+            cur.execute("SELECT thread_id FROM chat_threads WHERE last_used_at < ?", (time.time() - ttl_seconds,))
+            expired = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT thread_id FROM chat_threads ORDER BY last_used_at DESC LIMIT -1 OFFSET ?", (max_threads,))
+            overflow = [row[0] for row in cur.fetchall()]
+            evicted = set(expired) | set(overflow)
+            self._delete_threads(cur, evicted)
+            # Checkpoints of threads that were never touched (e.g. from before sessions were tracked)
+            cur.execute("DELETE FROM checkpoints WHERE thread_id NOT IN (SELECT thread_id FROM chat_threads)")
+            cur.execute("DELETE FROM writes WHERE thread_id NOT IN (SELECT thread_id FROM chat_threads)")
+        return len(evicted)
+
+    def session_stats(self):
+        self._ensure_threads()
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(*), COALESCE(SUM(turns), 0), MIN(last_used_at) FROM chat_threads")
+            threads, turns, oldest = cur.fetchone()
+            cur.execute("SELECT COUNT(*) FROM checkpoints")
+            checkpoints = cur.fetchone()[0]
+        return {
+            "threads": threads,
+            "turns": turns,
+            "checkpoints": checkpoints,
+            "oldest_idle_seconds": time.time() - oldest if oldest is not None else None,
+            "ttl_seconds": CHAT_THREAD_TTL_SECONDS,
+            "max_threads": CHAT_MAX_THREADS,
+        }
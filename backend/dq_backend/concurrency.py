@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+# ------------------------------------------ concurrency limits ----------------------------------------------
+# Caps how many LLM-backed requests run at once, so a burst of slow model calls can't
+# starve cheap endpoints such as table browsing. Requests over the limit wait for a slot;
+# once max_waiting requests are already queued new ones are rejected straight away.
+
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_WAITING = int(os.getenv("AI_MAX_WAITING", "64"))
+
+
+class LimitExceeded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrency, max_waiting):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = None
+
+    # Raises LimitExceeded when acquire() would be rejected right now; lets a handler answer
+    # 429 before it commits to a streamed response that takes its slot later
+    def check(self):
+        if self._semaphore is not None and self._semaphore.locked() and self.waiting >= self.max_waiting:
+            raise LimitExceeded(f"Too many AI requests in flight ({self.in_flight} running, {self.waiting} waiting).")
+
+    # acquire/release directly when the slot must outlive the handler, e.g. a streamed response
+    async def acquire(self):
+        # Created lazily so it binds to the server's event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.check()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_waiting": self.max_waiting,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
+
+
+ai_limiter = ConcurrencyLimiter(AI_MAX_CONCURRENCY, AI_MAX_WAITING)
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+# ------------------------------------------ connection management ----------------------------------------------
+# SQLite engines with a pool of connections instead of one StaticPool connection shared by
+# every request, so reads run in parallel on the threadpool instead of queuing.
+#   read_only_engine  - source data: opened with mode=ro and query_only, large mmap/page cache
+#   read_write_engine - rule storage and caches: WAL journal, so readers never wait for the
+#                       writer; writes are serialized by data_access.execute (write_lock)
+
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "16"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", str(64 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _tune(conn):
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    # Negative cache_size is in KiB, per connection
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+
+
+def _engine(creator, pool_size):
+    # Connections may be handed to another thread by the pool, never used by two at once
+    return create_engine("sqlite://", creator=creator, poolclass=QueuePool, pool_size=pool_size, max_overflow=pool_size)
+
+
+def read_only_engine(db_path, pool_size=SQLITE_POOL_SIZE):
+    uri = "file:" + os.path.abspath(db_path).replace("\\", "/") + "?mode=ro"
+
+    def connect():
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        _tune(conn)
+        return conn
+
+    return _engine(connect, pool_size)
+
+
+def read_write_engine(db_path, pool_size=SQLITE_POOL_SIZE):
+    def connect():
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        _tune(conn)
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    engine = _engine(connect, pool_size)
+
+    # Once per database file; WAL is persistent, so later connections pick it up
+    @event.listens_for(engine, "first_connect")
+    def set_wal(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA journal_mode = WAL")
+
+    return engine
+
+
+# Changes whenever the database file or its WAL is written by anyone. PRAGMA data_version
+# can't be used for this with a pool: it is per connection, so two connections disagree.
+def file_version(db_path):
+    version = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
@@ -0,0 +1,140 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Sequence
+from sqlalchemy.engine import Engine
+from metrics import SQL_STATEMENT_SECONDS, sql_operation
+
+# ------------------------------------------ data access ----------------------------------------------
+# Thin layer over the DB-API cursor of an engine. Rows come back as plain tuples
+# straight from the driver (no repr/literal_eval round trip) and values are bound
+# as parameters instead of being formatted into the SQL text.
+
+Row = tuple
+Params = Sequence[Any]
+
+FETCH_SIZE = 1000
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table/column name, since identifiers can't be bound as parameters."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+@contextmanager
+def cursor(engine: Engine):
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+    finally:
+        conn.close()
+
+
+# Batches of rows of a query; only time spent in the driver counts towards the statement's
+# latency, not the time the caller takes between batches
+def _iter_batches(engine: Engine, query: str, params: Params, fetch_size: int, with_columns: bool = False):
+    elapsed = 0.0
+    try:
+        with cursor(engine) as cur:
+            started = time.perf_counter()
+            cur.execute(query, tuple(params))
+            elapsed += time.perf_counter() - started
+            if with_columns:
+                yield [col[0] for col in cur.description]
+            while True:
+                started = time.perf_counter()
+                rows = cur.fetchmany(fetch_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                yield rows
+    finally:
+        SQL_STATEMENT_SECONDS.observe(elapsed, operation=sql_operation(query))
+
+
+# Stream rows of a query in batches of FETCH_SIZE
+def iter_rows(engine: Engine, query: str, params: Params = (), fetch_size: int = FETCH_SIZE) -> Iterator[Row]:
+    for rows in _iter_batches(engine, query, params, fetch_size):
+        yield from rows
+
+
+# Stream rows of a query as dicts keyed by column name
+def iter_dicts(engine: Engine, query: str, params: Params = (), fetch_size: int = FETCH_SIZE) -> Iterator[dict]:
+    batches = _iter_batches(engine, query, params, fetch_size, with_columns=True)
+    columns = next(batches)
+    for rows in batches:
+        for row in rows:
+            yield dict(zip(columns, row))
+
+
+def fetch_all(engine: Engine, query: str, params: Params = ()) -> list[Row]:
+    return list(iter_rows(engine, query, params))
+
+
+def fetch_one(engine: Engine, query: str, params: Params = ()) -> Optional[Row]:
+    with cursor(engine) as cur, SQL_STATEMENT_SECONDS.time(operation=sql_operation(query)):
+        cur.execute(query, tuple(params))
+        return cur.fetchone()
+
+
+def fetch_scalar(engine: Engine, query: str, params: Params = ()) -> Any:
+    row = fetch_one(engine, query, params)
+    return row[0] if row else None
+
+
+def fetch_column(engine: Engine, query: str, params: Params = ()) -> list:
+    return [row[0] for row in iter_rows(engine, query, params)]
+
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+# One lock per database: SQLite allows a single writer, so writers queue here instead of
+# spinning on busy_timeout
+def write_lock(engine: Engine) -> threading.Lock:
+    key = str(engine.url) if engine.url.database else id(engine)
+    with _write_locks_guard:
+        return _write_locks.setdefault(key, threading.Lock())
+
+
+# Run a write statement in its own transaction, returns the number of affected rows
+def execute(engine: Engine, query: str, params: Params = ()) -> int:
+    with write_lock(engine):
+        return _execute(engine, query, params)
+
+
+# Several writes in one transaction: commits when the block ends, rolls everything back on error
+@contextmanager
+def transaction(engine: Engine):
+    with write_lock(engine):
+        conn = engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            with SQL_STATEMENT_SECONDS.time(operation="transaction"):
+                yield cur
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def _execute(engine: Engine, query: str, params: Params) -> int:
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        with SQL_STATEMENT_SECONDS.time(operation=sql_operation(query)):
+            cur.execute(query, tuple(params))
+            conn.commit()
+        return cur.rowcount
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
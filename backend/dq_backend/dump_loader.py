@@ -0,0 +1,363 @@
+import argparse
+import codecs
+import re
+import sqlite3
+import sys
+import time
+
+# ------------------------------------------ mysql dump loader ----------------------------------------------
+# Loads a mysqldump file into SQLite. The dump is read in CHUNK_BYTES pieces and rows are
+# parsed out of the extended INSERT statements as they arrive, so memory use doesn't grow
+# with the size of the file or of a single statement. MySQL column types are mapped to
+# SQLite affinities, rows go in with executemany in batches of BATCH_ROWS and are committed
+# every TRANSACTION_ROWS with journaling and fsync off, and the dump's keys (plus any extra
+# indexes asked for) are built once all rows are in. Loading with the journal off means an
+# interrupted load leaves the file unusable: load again from the dump.
+#
+#   cd backend/dq_backend
+#   python dump_loader.py ../data/source_data/data.sql ../data/source_data/data.sqlite
+#   python dump_loader.py dump.sql out.sqlite --tables conventional_power_plants_DE --index conventional_power_plants_DE.postcode
+
+CHUNK_BYTES = 1 << 20
+HEAD_BYTES = 1 << 16
+BATCH_ROWS = 10_000
+TRANSACTION_ROWS = 500_000
+PROGRESS_EVERY_ROWS = 100_000
+
+_INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "integer", "bigint", "bool", "boolean", "bit", "year", "serial"}
+_REAL_TYPES = {"float", "double", "real"}
+_NUMERIC_TYPES = {"decimal", "numeric", "dec", "fixed"}
+_BLOB_TYPES = {"binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob", "geometry"}
+
+
+# SQLite affinity for a MySQL column type; dates, enums, sets and json stay TEXT
+def sqlite_affinity(mysql_type):
+    base = re.split(r"[\s(]", mysql_type.strip().lower(), maxsplit=1)[0]
+    if base in _INTEGER_TYPES:
+        return "INTEGER"
+    if base in _REAL_TYPES:
+        return "REAL"
+    if base in _NUMERIC_TYPES:
+        return "NUMERIC"
+    if base in _BLOB_TYPES:
+        return "BLOB"
+    return "TEXT"
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _unquote_mysql(name):
+    name = name.strip()
+    if len(name) >= 2 and name[0] == name[-1] == "`":
+        return name[1:-1].replace("``", "`")
+    return name
+
+
+# --------------------------------------------- statements ---------------------------------------------------------
+
+# Quoted string body with backslash escapes, written as an unrolled loop so it never backtracks
+_STRING_BODY = r"[^'\\]*(?:\\.[^'\\]*)*"
+_STRING = f"'{_STRING_BODY}'"
+# Whitespace and comments between statements; /*!...*/ version comments are skipped like any other
+_GAP = re.compile(r"(?:\s+|--[^\n]*(?:\n|$)|#[^\n]*(?:\n|$)|/\*.*?\*/)*", re.S)
+_INSERT_HEAD = re.compile(
+    r"(?:INSERT|REPLACE)\s+(?:IGNORE\s+)?INTO\s+(`(?:[^`]|``)+`|\w+)\s*(?:\(([^)]*)\)\s*)?VALUES\s*",
+    re.I,
+)
+# Any other statement up to its ";", quote and comment aware
+_STATEMENT = re.compile(rf"((?:{_STRING}|`(?:[^`]|``)*`|\"(?:[^\"\\]|\\.)*\"|/\*.*?\*/|[^'`\"/;]|/(?!\*))*);", re.S)
+# One row of an extended INSERT and the "," or ";" after it
+_ROW = re.compile(rf"\s*\(([^'()]*(?:{_STRING}[^'()]*)*)\)\s*([,;])", re.S)
+# A value: quoted string (with an optional _charset introducer), NULL, or a bare literal
+_VALUE = re.compile(rf"(?:_\w+\s*)?'({_STRING_BODY})'|(NULL)|([^,\s]+)", re.S)
+_ESCAPE = re.compile(r"\\(.)", re.S)
+_ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    return _ESCAPE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)), text)
+
+
+def _literal(text, null, bare):
+    if bare:
+        if bare.startswith("0x"):
+            return bytes.fromhex(bare[2:])
+        if bare.startswith("b'"):
+            return int(bare[2:-1] or "0", 2)
+        return bare
+    if null:
+        return None
+    return _unescape(text)
+
+
+# Values of one row; quoted strings are unescaped, NULL is None and bare literals (numbers)
+# are passed on as text for the column affinity to convert. Most rows have no escapes or
+# binary literals and take the one-pass comprehension
+def _parse_row(inner):
+    values = _VALUE.findall(inner)
+    if "\\" not in inner and "0x" not in inner and "b'" not in inner:
+        return [bare or (None if null else text) for text, null, bare in values]
+    return [_literal(text, null, bare) for text, null, bare in values]
+
+
+# Split at commas outside parentheses and quotes
+def _split_top_level(body):
+    parts, depth, quote, start = [], 0, None, 0
+    i = 0
+    while i < len(body):
+        ch = body[i]
+        if quote:
+            if ch == "\\" and quote == "'":
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in "'`\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(body[start:i])
+            start = i + 1
+        i += 1
+    parts.append(body[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _key_columns(spec):
+    return [_unquote_mysql(re.sub(r"\(\d+\)|\s+(?:ASC|DESC)\b", "", part, flags=re.I)) for part in _split_top_level(spec)]
+
+
+# Columns [(name, mysql type)] and keys [(name, unique, columns)] of a CREATE TABLE
+def parse_create_table(statement):
+    match = re.match(r"CREATE\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(`(?:[^`]|``)+`|\w+)\s*\((.*)\)", statement, re.I | re.S)
+    if match is None:
+        return None
+    table = _unquote_mysql(match.group(1))
+    columns, keys = [], []
+    for definition in _split_top_level(match.group(2)):
+        key = re.match(r"(PRIMARY\s+KEY|UNIQUE(?:\s+(?:KEY|INDEX))?|KEY|INDEX)\s*(`(?:[^`]|``)+`)?\s*(?:USING\s+\w+\s*)?\((.*)\)", definition, re.I | re.S)
+        if key:
+            kind = key.group(1).upper()
+            name = _unquote_mysql(key.group(2)) if key.group(2) else "pk" if kind.startswith("PRIMARY") else None
+            keys.append((name, kind.split()[0] not in ("KEY", "INDEX"), _key_columns(key.group(3))))
+        elif definition.startswith("`"):
+            column = re.match(r"(`(?:[^`]|``)+`)\s+(\w+(?:\s*\([^)]*\))?)", definition, re.S)
+            if column:
+                columns.append((_unquote_mysql(column.group(1)), column.group(2)))
+        # FULLTEXT/SPATIAL keys, foreign keys and checks have no use in the SQLite copy
+    return table, columns, keys
+
+
+class _Reader:
+    def __init__(self, f):
+        self.f = f
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    # Append the next chunk, dropping what has been consumed; False once the file is exhausted
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_BYTES)
+        self.bytes_read += len(chunk)
+        self.eof = not chunk
+        self.text = self.text[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        return bool(chunk)
+
+    # Make sure at least n characters are buffered past the current position (fewer at the end of the file)
+    def ensure(self, n):
+        while len(self.text) - self.pos < n and self.fill():
+            pass
+
+    # Match pattern at the current position, reading more input while the match may be cut off
+    def match(self, pattern):
+        while True:
+            match = pattern.match(self.text, self.pos)
+            if match and (match.end() < len(self.text) or self.eof):
+                return match
+            if not self.fill():
+                return pattern.match(self.text, self.pos)
+
+
+# Yields ("drop", table), ("create", table, columns, keys), ("insert", table) as soon as an
+# INSERT statement starts and ("rows", table, columns or None, rows) with at most BATCH_ROWS
+# rows per event, in dump order
+def parse_dump(f, reader=None):
+    reader = reader or _Reader(f)
+    while True:
+        reader.pos = reader.match(_GAP).end()
+        if reader.pos >= len(reader.text) and not reader.fill():
+            return
+        # A miss here just means another kind of statement, so look at a bounded window instead of reading on
+        reader.ensure(HEAD_BYTES)
+        head = _INSERT_HEAD.match(reader.text, reader.pos)
+        if head:
+            reader.pos = head.end()
+            table = _unquote_mysql(head.group(1))
+            columns = [_unquote_mysql(c) for c in head.group(2).split(",")] if head.group(2) else None
+            yield ("insert", table)
+            batch = []
+            while True:
+                row = reader.match(_ROW)
+                if row is None:
+                    raise ValueError(f"Malformed or truncated INSERT into {table} at byte ~{reader.bytes_read}.")
+                reader.pos = row.end()
+                batch.append(_parse_row(row.group(1)))
+                if len(batch) >= BATCH_ROWS:
+                    yield ("rows", table, columns, batch)
+                    batch = []
+                if row.group(2) == ";":
+                    break
+            if batch:
+                yield ("rows", table, columns, batch)
+            continue
+
+        statement = reader.match(_STATEMENT)
+        if statement is None:
+            if reader.text[reader.pos:].strip():
+                raise ValueError(f"Unterminated statement at byte ~{reader.bytes_read}.")
+            return
+        reader.pos = statement.end()
+        text = statement.group(1).strip()
+        drop = re.match(r"DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?(`(?:[^`]|``)+`|\w+)\s*$", text, re.I)
+        if drop:
+            yield ("drop", _unquote_mysql(drop.group(1)))
+        elif re.match(r"CREATE\s+(?:TEMPORARY\s+)?TABLE\b", text, re.I):
+            parsed = parse_create_table(text)
+            if parsed:
+                yield ("create", *parsed)
+        # SET, LOCK/UNLOCK TABLES and the like don't apply to SQLite
+
+
+# --------------------------------------------- loading ---------------------------------------------------------
+
+def _bulk_mode(conn):
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")
+
+
+def _report(message):
+    print(message, file=sys.stderr)
+
+
+# Load the tables of a mysqldump (all of them, or only `tables`) into the SQLite file at db_path.
+# extra_indexes: "table.column" or "table.col_a,col_b" specs built after the load with the dump's keys.
+# Returns per-table row counts and rates
+def load_dump(dump_path, db_path, tables=None, extra_indexes=(), report=_report):
+    wanted = set(tables) if tables else None
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    started = time.perf_counter()
+    stats = {}
+    keys = []
+    try:
+        _bulk_mode(conn)
+        with open(dump_path, "rb") as f:
+            reader = _Reader(f)
+            conn.execute("BEGIN")
+            pending = 0
+            for event in parse_dump(f, reader):
+                table = event[1]
+                if wanted is not None and table not in wanted:
+                    continue
+                # A table's clock starts at its CREATE or first INSERT, so its rate includes parsing
+                if event[0] in ("create", "insert"):
+                    stats.setdefault(table, {"rows": 0, "started": time.perf_counter()})
+                if event[0] == "drop":
+                    conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+                elif event[0] == "insert":
+                    continue
+                elif event[0] == "create":
+                    _, _, columns, table_keys = event
+                    column_defs = ", ".join(f"{_quote(name)} {sqlite_affinity(col_type)}" for name, col_type in columns)
+                    conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({column_defs})")
+                    keys.extend((table, name, unique, key_columns) for name, unique, key_columns in table_keys)
+                else:
+                    _, _, columns, rows = event
+                    table_stats = stats.setdefault(table, {"rows": 0, "started": time.perf_counter()})
+                    target = f"{_quote(table)} ({', '.join(_quote(c) for c in columns)})" if columns else _quote(table)
+                    placeholders = ", ".join("?" for _ in rows[0])
+                    conn.executemany(f"INSERT INTO {target} VALUES ({placeholders})", rows)
+                    before = table_stats["rows"]
+                    table_stats["rows"] += len(rows)
+                    pending += len(rows)
+                    if pending >= TRANSACTION_ROWS:
+                        conn.execute("COMMIT")
+                        conn.execute("BEGIN")
+                        pending = 0
+                    if table_stats["rows"] // PROGRESS_EVERY_ROWS > before // PROGRESS_EVERY_ROWS:
+                        elapsed = time.perf_counter() - table_stats["started"]
+                        report(f"{table}: {table_stats['rows']:,} rows, {table_stats['rows'] / elapsed:,.0f} rows/s, "
+                               f"{reader.bytes_read / 1e6:,.0f} MB read")
+                    table_stats["seconds"] = time.perf_counter() - table_stats["started"]
+            conn.execute("COMMIT")
+            bytes_read = reader.bytes_read
+        load_seconds = time.perf_counter() - started
+
+        # Indexes last: one sorted build per index is far cheaper than maintaining it per row
+        index_started = time.perf_counter()
+        for spec in extra_indexes:
+            table, _, spec_columns = spec.partition(".")
+            keys.append((table, None, False, [c.strip() for c in spec_columns.split(",") if c.strip()]))
+        for table, name, unique, key_columns in keys:
+            index_name = f"ix_{table}_{name or '_'.join(key_columns)}"
+            conn.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {_quote(index_name)} "
+                f"ON {_quote(table)} ({', '.join(_quote(c) for c in key_columns)})"
+            )
+        for table in stats:
+            conn.execute(f"ANALYZE {_quote(table)}")
+        index_seconds = time.perf_counter() - index_started
+    finally:
+        conn.close()
+
+    total_rows = sum(table_stats["rows"] for table_stats in stats.values())
+    summary = {
+        "tables": {
+            table: {
+                "rows": table_stats["rows"],
+                "seconds": round(table_stats.get("seconds", 0.0), 3),
+                "rows_per_second": round(table_stats["rows"] / table_stats["seconds"]) if table_stats.get("seconds") else None,
+            }
+            for table, table_stats in stats.items()
+        },
+        "rows": total_rows,
+        "bytes": bytes_read,
+        "load_seconds": round(load_seconds, 3),
+        "index_seconds": round(index_seconds, 3),
+        "rows_per_second": round(total_rows / load_seconds) if load_seconds else None,
+        "mb_per_second": round(bytes_read / 1e6 / load_seconds, 1) if load_seconds else None,
+    }
+    for table, table_stats in summary["tables"].items():
+        report(f"{table}: {table_stats['rows']:,} rows in {table_stats['seconds']:.2f}s ({table_stats['rows_per_second'] or 0:,} rows/s)")
+    report(f"Loaded {total_rows:,} rows from {bytes_read / 1e6:,.1f} MB in {load_seconds:.2f}s "
+           f"({summary['rows_per_second'] or 0:,} rows/s, {summary['mb_per_second'] or 0} MB/s), indexes in {index_seconds:.2f}s")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a MySQL dump into a SQLite database")
+    parser.add_argument("dump", help="mysqldump file")
+    parser.add_argument("database", help="SQLite file to load into (created if missing)")
+    parser.add_argument("--tables", default=None, help="comma separated tables to load (default: all)")
+    parser.add_argument("--index", action="append", default=[], metavar="TABLE.COLUMN[,COLUMN]",
+                        help="extra index to build after loading, repeatable")
+    args = parser.parse_args()
+    tables = [t.strip() for t in args.tables.split(",")] if args.tables else None
+    load_dump(args.dump, args.database, tables, args.index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy import event
+from metrics import GRAPH_NODE_SECONDS, LLM_CALL_SECONDS, LLM_TOKENS, SQL_STATEMENT_SECONDS, sql_operation
+
+# ------------------------------------------ instrumentation ----------------------------------------------
+# Hooks that feed metrics.py: LangChain callback handlers for graph nodes and LLM calls,
+# and SQLAlchemy cursor events for statements run through an engine (the SQL tools and
+# SQLDatabase). Statements run through data_access are timed there.
+
+
+# Attached to a compiled graph (graph.with_config(callbacks=[...])); times each node run.
+# A node's own runnable often shares the node's name, so only the outermost run is counted.
+class NodeMetricsHandler(BaseCallbackHandler):
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node is None or kwargs.get("name") != node:
+            return
+        with self._lock:
+            parent = self._runs.get(parent_run_id)
+            if parent is not None and parent[0] == node:
+                return
+            self._runs[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id, status):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            GRAPH_NODE_SECONDS.observe(time.perf_counter() - run[1], node=run[0], status=status)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+
+# Attached to the LLM client itself, so every call is counted once wherever it comes from
+class LLMMetricsHandler(BaseCallbackHandler):
+    def __init__(self, model):
+        self.model = model
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def _finish(self, run_id, status):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is not None:
+            LLM_CALL_SECONDS.observe(time.perf_counter() - started, model=self.model, status=status)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, "ok")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                LLM_TOKENS.inc(usage.get("input_tokens", 0), model=self.model, type="input")
+                LLM_TOKENS.inc(usage.get("output_tokens", 0), model=self.model, type="output")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("dq_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["dq_query_started"].pop()
+        SQL_STATEMENT_SECONDS.observe(time.perf_counter() - started, operation=sql_operation(statement))
+
+    return engine
+
+
+node_metrics = NodeMetricsHandler()
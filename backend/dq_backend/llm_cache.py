@@ -0,0 +1,114 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from data_access import execute, fetch_one, fetch_all
+
+# ------------------------------------------ llm result cache ----------------------------------------------
+# Persistent cache for LLM answers (rule to SQL conversions, rule suggestions), stored in
+# its own SQLite file. Entries expire after ttl_seconds, and once there are more than
+# max_entries the least recently used ones are evicted. Hits, misses and bypasses are
+# counted per kind of answer.
+
+
+# Collapses whitespace and drops trailing punctuation but keeps the case, for keys of text
+# whose literals matter: "energy_source must be 'Gas'" and "... 'gas'" are different rules
+def normalize_whitespace(text):
+    text = re.sub(r"\s+", " ", (text or "").strip())
+    return text.rstrip(" .;!")
+
+
+def hash_text(text):
+    return hashlib.sha1((text or "").encode()).hexdigest()[:16]
+
+
+class LLMCache:
+    def __init__(self, engine, max_entries=10000, ttl_seconds=7 * 24 * 3600, evict_every=100):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._stats = {}
+        self._ready = False
+
+    def _ensure_storage(self):
+        if self._ready:
+            return
+        execute(self.engine, """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                kind TEXT,
+                value TEXT,
+                created_at REAL,
+                last_used_at REAL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        execute(self.engine, "CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used_at ON llm_cache (last_used_at)")
+        self._ready = True
+
+    def _count(self, kind, outcome):
+        with self._lock:
+            counters = self._stats.setdefault(kind, {"hits": 0, "misses": 0, "bypassed": 0})
+            counters[outcome] += 1
+
+    @staticmethod
+    def make_key(kind, *parts):
+        return kind + ":" + hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+    def get(self, kind, key):
+        self._ensure_storage()
+        row = fetch_one(self.engine, "SELECT value, created_at FROM llm_cache WHERE cache_key = ?", (key,))
+        now = time.time()
+        if row is None or now - row[1] > self.ttl_seconds:
+            if row is not None:
+                execute(self.engine, "DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+            self._count(kind, "misses")
+            return None
+        execute(self.engine, "UPDATE llm_cache SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?", (now, key))
+        self._count(kind, "hits")
+        return json.loads(row[0])
+
+    def put(self, kind, key, value):
+        self._ensure_storage()
+        now = time.time()
+        execute(
+            self.engine,
+            "INSERT OR REPLACE INTO llm_cache (cache_key, kind, value, created_at, last_used_at, hits) VALUES (?, ?, ?, ?, ?, 0)",
+            (key, kind, json.dumps(value), now, now),
+        )
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def bypass(self, kind):
+        self._count(kind, "bypassed")
+
+    # Drop expired entries, then the least recently used ones above max_entries
+    def evict(self):
+        self._ensure_storage()
+        execute(self.engine, "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        execute(self.engine, """
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self):
+        self._ensure_storage()
+        execute(self.engine, "DELETE FROM llm_cache")
+
+    def stats(self):
+        self._ensure_storage()
+        with self._lock:
+            stats = {kind: dict(counters) for kind, counters in self._stats.items()}
+        for counters in stats.values():
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_ratio"] = counters["hits"] / lookups if lookups else None
+        entries = dict(fetch_all(self.engine, "SELECT kind, COUNT(*) FROM llm_cache GROUP BY kind"))
+        return {"kinds": stats, "entries": entries, "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds}
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# ------------------------------------------ llm providers ----------------------------------------------
+# LLM_PROVIDER picks the chat model behind get_llm():
+#   gemini - ChatGoogleGenerativeAI (default)
+#   fake   - FakeChatModel, a deterministic local stand-in for load tests and offline runs
+# LLM_RECORD_PATH (any provider) appends every answer to a JSONL file that FAKE_LLM_RECORDINGS
+# can replay later, so a load test can run on real model output without calling the model.
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH")
+FAKE_LLM_RECORDINGS = os.getenv("FAKE_LLM_RECORDINGS")
+FAKE_LLM_LATENCY_MEDIAN_MS = float(os.getenv("FAKE_LLM_LATENCY_MEDIAN_MS", "800"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "42"))
+
+
+def _text(content):
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+# Recordings are keyed by the bound tool names and the last non-system message
+def recording_key(messages, tool_names=()):
+    last = next((m for m in reversed(messages) if not isinstance(m, SystemMessage)), None)
+    text = re.sub(r"\s+", " ", _text(last.content).strip().lower()) if last is not None else ""
+    return hashlib.sha1(json.dumps([sorted(tool_names), type(last).__name__, text]).encode()).hexdigest()
+
+
+def load_recordings(path):
+    recordings = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    recordings[entry["key"]] = entry
+    return recordings
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model: replays recorded answers, otherwise follows a fixed script per
+    prompt (tool call, then answer) that drives the rule-to-SQL and know-all graphs to the end.
+    Every call waits a log-normally distributed latency around latency_median_ms."""
+
+    recordings: dict = {}
+    latency_median_ms: float = FAKE_LLM_LATENCY_MEDIAN_MS
+    latency_sigma: float = FAKE_LLM_LATENCY_SIGMA
+    seed: int = FAKE_LLM_SEED
+    rng: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, *, tool_choice: Optional[str] = None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _latency(self):
+        if self.latency_median_ms <= 0:
+            return 0.0
+        return self.latency_median_ms / 1000 * math.exp(self.rng.gauss(0, self.latency_sigma))
+
+    def _respond(self, messages, tools=None, tool_choice=None):
+        tool_names = [tool["function"]["name"] for tool in tools or []]
+        recorded = self.recordings.get(recording_key(messages, tool_names))
+        if recorded is not None:
+            tool_calls = [{**call, "id": f"call_{uuid.uuid4().hex[:12]}"} for call in recorded.get("tool_calls", [])]
+            return AIMessage(content=recorded.get("content", ""), tool_calls=tool_calls)
+        return self._scripted(messages, tool_names, tool_choice)
+
+    def _scripted(self, messages, tool_names, tool_choice):
+        system = "\n".join(_text(m.content) for m in messages if isinstance(m, SystemMessage))
+        last = messages[-1] if messages else HumanMessage(content="")
+        table = re.search(r"^Table: (.+)$", system, flags=re.MULTILINE)
+        column = re.search(r"^Column: (.+)$", system, flags=re.MULTILINE) or re.search(r"column user is interested .* is - '([^']+)'", system)
+        column = column.group(1).strip() if column else "value"
+
+        def call(name, args):
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+
+        # Rule to SQL: check_query reproduces the query it was given
+        if tool_choice == "any" and "sql_db_query" in tool_names:
+            return call("sql_db_query", {"query": _text(last.content)})
+        # Rule to SQL: generate_query proposes a query, and answers with it once it has run
+        if "sql_db_query" in tool_names and table and "sql_db_list_tables" not in tool_names:
+            if isinstance(last, ToolMessage):
+                query = next(
+                    (c["args"]["query"] for m in reversed(messages) if isinstance(m, AIMessage) for c in m.tool_calls or [] if c["name"] == "sql_db_query"),
+                    "",
+                )
+                return AIMessage(content=f"QUERY: {query}")
+            return call("sql_db_query", {"query": f"SELECT rowid FROM {table.group(1).strip()} WHERE {column} IS NULL"})
+        # Know-all chat: look around once, then answer with a rule
+        if "sql_db_list_tables" in tool_names:
+            if isinstance(last, HumanMessage):
+                return call("sql_db_list_tables", {"tool_input": ""})
+            return AIMessage(content=f"The '{column}' column looks mostly filled.\nRULE: The '{column}' column should not contain null values.")
+        if "running summary" in system:
+            return AIMessage(content=f"The user explored the '{column}' column and discussed not-null rules.")
+        return AIMessage(content=f"RULE: The values in the {column} column should not be null")
+
+    def _result(self, message, messages):
+        prompt_tokens = sum(len(_text(m.content)) for m in messages) // 4
+        output_tokens = len(_text(message.content)) // 4 + 10 * len(message.tool_calls)
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": output_tokens, "total_tokens": prompt_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._latency())
+        return self._result(self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice")), messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._latency())
+        return self._result(self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice")), messages)
+
+
+# Appends every answer of the model it is attached to, keyed like FakeChatModel looks them up
+class RecordingHandler(BaseCallbackHandler):
+    def __init__(self, path):
+        self.path = path
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, invocation_params=None, **kwargs):
+        tools = (invocation_params or {}).get("tools") or []
+        tool_names = [tool.get("function", tool).get("name") for tool in tools if isinstance(tool, dict)]
+        self._keys[run_id] = recording_key(messages[0], tool_names)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        key = self._keys.pop(run_id, None)
+        message = getattr(response.generations[0][0], "message", None) if response.generations else None
+        if key is None or message is None:
+            return
+        entry = {
+            "key": key,
+            "content": _text(message.content),
+            "tool_calls": [{"name": call["name"], "args": call["args"]} for call in getattr(message, "tool_calls", []) or []],
+        }
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def create_llm(model, callbacks=()):
+    callbacks = list(callbacks)
+    if LLM_RECORD_PATH:
+        callbacks.append(RecordingHandler(LLM_RECORD_PATH))
+    if LLM_PROVIDER == "fake":
+        return FakeChatModel(recordings=load_recordings(FAKE_LLM_RECORDINGS), callbacks=callbacks)
+    if LLM_PROVIDER == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=model, callbacks=callbacks)
+    raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}', expected 'gemini' or 'fake'.")
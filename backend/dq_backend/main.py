@@ -1,14 +1,30 @@
-from fastapi import FastAPI, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Literal
+import asyncio
 import uuid
+import json
+import time
 from utils import (
-    convert_rule_to_sql, insert_rule, delete_rule,
-    get_rule_suggestion_on_column, get_all_rules_of_table,
-    get_query_test_results, load_table_values, load_col_values, chatbot
+    aconvert_rule_to_sql, insert_rule, delete_rule,
+    aget_rule_suggestion_on_column, get_all_rules_of_table,
+    get_query_test_results, load_table_values, load_col_values, load_rows_by_rowid,
+    normalize_stored_rules, get_profile_of_table, rule_repository, llm_cache, tool_cache, get_chatbot, checkpointer
 )
-from langchain_core.messages import HumanMessage
+from rule_engine import run_rules_on_table
+from rule_results import page_result, combine_results, rows_matching_any_rule
+from precompute import (
+    start_precompute, schedule_table, get_precompute_status,
+    get_precomputed_suggestion, get_precomputed_suggestions
+)
+from batch_suggestions import prepare_rule_suggestions_batch, astream_rule_suggestions
+from rule_import import RuleImportError, parse_rules_document, aimport_rules, export_rules
+from concurrency import ai_limiter, LimitExceeded
+from singleflight import single_flight
+from metrics import REGISTRY, HTTP_REQUEST_SECONDS
+from langchain_core.messages import HumanMessage, AIMessageChunk
 
 app = FastAPI(
     title="Data Quality Rule Management API",
@@ -17,10 +33,54 @@ app = FastAPI(
 )
 
 
+@app.on_event("startup")
+async def start_background_jobs():
+    start_precompute(asyncio.get_running_loop())
+
+
+# Latency per route template (not raw path, to keep label values bounded)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=status)
+
+
+# Cache, coalescing and concurrency gauges, read from their stats() at scrape time
+def cache_metrics():
+    llm = llm_cache.stats()["kinds"]
+    tools = tool_cache.stats()["tools"]
+    flights = single_flight.stats()
+    limiter = ai_limiter.stats()
+    return [
+        ("dq_llm_cache_hit_ratio", "Hit ratio of the LLM answer cache", "gauge",
+         [({"kind": kind}, counters["hit_ratio"]) for kind, counters in llm.items()]),
+        ("dq_llm_cache_lookups_total", "LLM answer cache lookups", "counter",
+         [({"kind": kind, "outcome": outcome}, counters[outcome]) for kind, counters in llm.items() for outcome in ("hits", "misses", "bypassed")]),
+        ("dq_tool_cache_hit_ratio", "Hit ratio of the chatbot SQL tool cache", "gauge",
+         [({"tool": tool}, counters["hit_ratio"]) for tool, counters in tools.items()]),
+        ("dq_single_flight_calls_total", "Calls through single flight, by whether they ran or joined one in flight", "counter",
+         [({"kind": kind, "outcome": outcome}, counters[outcome]) for kind, counters in flights["kinds"].items() for outcome in ("leaders", "coalesced")]),
+        ("dq_ai_requests", "AI requests running or waiting for a slot", "gauge",
+         [({"state": "in_flight"}, limiter["in_flight"]), ({"state": "waiting"}, limiter["waiting"])]),
+    ]
+
+
+REGISTRY.register_collector(cache_metrics)
+
+
 class ConvertRuleRequest(BaseModel):
     table_name: str = Field(..., description="Name of the database table", example="conventional_power_plants_DE")
     column_name: str = Field(..., description="Column on which the rule is applied", example="postcode")
     rule: str = Field(..., description="Rule text to be converted into SQL", example="there should not be a null value")
+    use_cache: bool = Field(default=True, description="Set to false to skip the cached conversion and ask the agent again", example=True)
 
 
 class AddRuleRequest(BaseModel):
@@ -35,85 +95,460 @@ class DeleteRuleRequest(BaseModel):
     rule_id: str = Field(..., description="Unique identifier of the rule to be deleted", example="123e4567-e89b-12d3-a456-426614174000")
 
 
+class AddRulesRequest(BaseModel):
+    rules: List[AddRuleRequest] = Field(..., description="Rules to insert in one transaction")
+
+
+class UpdateRuleRequest(BaseModel):
+    rule_id: str = Field(..., description="Unique identifier of the rule to update", example="123e4567-e89b-12d3-a456-426614174000")
+    rule: Optional[str] = Field(default=None, description="New rule text", example="there should not be a null value")
+    rule_category: Optional[str] = Field(default=None, description="New category (info, warning, error)", example="error")
+    sql_query: Optional[str] = Field(default=None, description="New SQL representation of the rule", example=None)
+
+
+class UpdateRulesRequest(BaseModel):
+    rules: List[UpdateRuleRequest] = Field(..., description="Rule changes to apply in one transaction; omitted fields are kept")
+
+
+class DeleteRulesRequest(BaseModel):
+    rule_ids: List[str] = Field(..., description="Rules to delete in one transaction", example=["123e4567-e89b-12d3-a456-426614174000"])
+
+
 class RuleSuggestionRequest(BaseModel):
     table_name: str = Field(..., description="Name of the database table", example="conventional_power_plants_DE")
     column_name: str = Field(..., description="Column on which the rule is applied", example="postcode")
     existing_rules: Optional[List[str]] = Field(default=[], description="List of existing rules for the column", example=["must not be null", "must be unique"])
+    use_cache: bool = Field(default=True, description="Set to false to skip precomputed/cached suggestions", example=True)
+
+
+class BatchRuleSuggestionRequest(BaseModel):
+    table_name: str = Field(..., description="Name of the database table", example="conventional_power_plants_DE")
+    column_names: Optional[List[str]] = Field(default=None, description="Columns to suggest rules for, all columns if omitted", example=["postcode", "capacity_net_bnetza"])
+    use_cache: bool = Field(default=True, description="Set to false to skip precomputed/cached suggestions", example=True)
+    format: Literal["ndjson", "sse"] = Field(default="ndjson", description="Stream as newline-delimited JSON or server-sent events", example="ndjson")
 
 
 class TableDataRequest(BaseModel):
     table_name: str = Field(..., description="Name of the database table", example="conventional_power_plants_DE")
-    offset: int = Field(default=0, description="Row offset (for pagination)", example=0)
+    offset: int = Field(default=0, description="Row offset (deprecated, use cursor)", example=0)
     limit: int = Field(default=100, description="Maximum number of rows to return", example=50)
+    cursor: Optional[str] = Field(default=None, description="next_cursor of the previous page", example=None)
 
 
 class ColumnDataRequest(BaseModel):
     table_name: str = Field(..., description="Name of the database table", example="conventional_power_plants_DE")
     column_name: str = Field(..., description="Column on which the rule is applied", example="postcode")
-    offset: int = Field(default=0, description="Row offset (for pagination)", example=0)
+    offset: int = Field(default=0, description="Row offset (deprecated, use cursor)", example=0)
     limit: int = Field(default=100, description="Maximum number of rows to return", example=50)
+    cursor: Optional[str] = Field(default=None, description="next_cursor of the previous page", example=None)
+
+
+class RowsByIdRequest(BaseModel):
+    table_name: str = Field(..., description="Name of the database table", example="conventional_power_plants_DE")
+    row_ids: List[int] = Field(..., description="rowids of the rows to fetch, e.g. a page of a rule result", example=[27, 105, 169])
+
+
+class CombineRuleResultsRequest(BaseModel):
+    handles: List[str] = Field(..., description="Handles of stored rule results, combined left to right")
+    op: Literal["and", "or", "andnot"] = Field(default="or", description="Bitmap operation to apply", example="or")
 
 
 class ChatbotRequest(BaseModel):
     user_input: str = Field(..., description="User query or message to the AI chatbot", example="Suggest a rule for validating not null values")
     table_name: str = Field(..., description="Name of the database table", example="conventional_power_plants_DE")
     column_name: str = Field(..., description="Column on which the rule is applied", example="postcode")
+    session_id: Optional[str] = Field(default=None, description="Conversation to continue; a new one is started if omitted", example=None)
 
 
 # API Endpoints
+# Handlers are async: LLM calls are awaited (ainvoke) under ai_limiter, and blocking
+# SQLite work runs in the threadpool, so browsing data never queues behind the model.
+
+
+def too_many_ai_requests(e):
+    return JSONResponse(status_code=429, content={"message": str(e)})
+
 
 @app.post("/convert_rule_to_sql/")
-def convert_rule_to_sql_api(request: ConvertRuleRequest):
-    output = convert_rule_to_sql(request.rule, request.table_name, request.column_name)
-    if output[0]:
-        stats_dict = get_query_test_results(output[1], request.column_name, request.table_name)
+async def convert_rule_to_sql_api(request: ConvertRuleRequest):
+    try:
+        async with ai_limiter:
+            query_ready, output, path = await aconvert_rule_to_sql(request.rule, request.table_name, request.column_name, request.use_cache)
+    except LimitExceeded as e:
+        return too_many_ai_requests(e)
+    if query_ready:
+        try:
+            stats_dict = await run_in_threadpool(get_query_test_results, output, request.column_name, request.table_name)
+        except LookupError as e:
+            return JSONResponse(status_code=404, content={"message": str(e)})
     else:
         stats_dict = None
-    return JSONResponse(content={"sql": output, "stats": stats_dict})
+    return JSONResponse(content={"sql": [query_ready, output], "stats": stats_dict, "path": path})
 
 
 @app.put("/add_rule/")
-def add_rule_api(request: AddRuleRequest):
+async def add_rule_api(request: AddRuleRequest):
     rule_id = str(uuid.uuid4())
-    insert_rule(rule_id, request.rule, request.table_name,
-                request.column_name, request.rule_category, request.sql_query)
+    try:
+        await run_in_threadpool(insert_rule, rule_id, request.rule, request.table_name,
+                    request.column_name, request.rule_category, request.sql_query)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
     return JSONResponse(content={"message": f"Rule '{rule_id}' inserted successfully."})
 
 
 @app.delete("/delete_rule/")
-def delete_rule_api(request: DeleteRuleRequest):
-    delete_rule(request.rule_id)
+async def delete_rule_api(request: DeleteRuleRequest):
+    await run_in_threadpool(delete_rule, request.rule_id)
     return JSONResponse(content={"message": f"Rule '{request.rule_id}' deleted successfully (if it existed)."})
 
 
+@app.put("/add_rules/")
+async def add_rules_api(request: AddRulesRequest):
+    rules = [{"rule_id": str(uuid.uuid4()), **rule.dict()} for rule in request.rules]
+    try:
+        rule_ids = await run_in_threadpool(rule_repository.insert_rules, rules)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    return JSONResponse(content={"message": f"{len(rule_ids)} rules inserted successfully.", "rule_ids": rule_ids})
+
+
+@app.post("/update_rules/")
+async def update_rules_api(request: UpdateRulesRequest):
+    try:
+        changed = await run_in_threadpool(rule_repository.update_rules, [rule.dict() for rule in request.rules])
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    return JSONResponse(content={"message": f"{changed} rules updated successfully.", "updated": changed})
+
+
+@app.delete("/delete_rules/")
+async def delete_rules_api(request: DeleteRulesRequest):
+    deleted = await run_in_threadpool(rule_repository.delete_rules, request.rule_ids)
+    return JSONResponse(content={"message": f"{deleted} rules deleted successfully.", "deleted": deleted})
+
+
+# Body is a JSON or YAML rules file: a list of rules or {"rules": [...]} with rule, table_name,
+# column_name, rule_category and optionally rule_id and sql_query (converted when missing)
+@app.post("/rules/import")
+async def import_rules_api(request: Request,
+                      format: Optional[Literal["json", "yaml"]] = Query(None, description="Format of the body, taken from the Content-Type if omitted"),
+                      use_cache: bool = Query(True, description="Set to false to skip cached conversions"),
+                      replace: bool = Query(False, description="Overwrite rules whose rule_id already exists"),
+                      skip_invalid: bool = Query(False, description="Store the valid rules even if some fail to convert")):
+    if format is None:
+        format = "yaml" if "yaml" in request.headers.get("content-type", "") else "json"
+    try:
+        rules = parse_rules_document(await request.body(), format)
+    except RuleImportError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    try:
+        report = await aimport_rules(rules, use_cache, replace, skip_invalid)
+    except ValueError as e:
+        return JSONResponse(status_code=409, content={"message": str(e)})
+    if report["errors"] and not report["imported"]:
+        return JSONResponse(status_code=422, content={"message": f"{len(report['errors'])} of {len(rules)} rules failed, nothing imported.", **report})
+    return JSONResponse(content={"message": f"{report['imported']} rules imported successfully.", **report})
+
+
+@app.get("/rules/export")
+async def export_rules_api(table_name: Optional[str] = Query(None, description="Only export the rules of this table", example="conventional_power_plants_DE"),
+                      format: Literal["json", "yaml"] = Query("json", description="Export as JSON or YAML")):
+    try:
+        chunks = await run_in_threadpool(export_rules, table_name, format)
+    except RuleImportError as e:
+        return JSONResponse(status_code=415, content={"message": str(e)})
+    media_type = "application/yaml" if format == "yaml" else "application/json"
+    filename = f"rules.{'yaml' if format == 'yaml' else 'json'}"
+    return StreamingResponse(chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
 @app.post("/get_rule_suggestion/")
-def get_rule_suggestion_api(request: RuleSuggestionRequest):
-    suggested_rule = get_rule_suggestion_on_column(request.column_name, request.table_name, request.existing_rules)
-    return JSONResponse(content={"suggested_rule": suggested_rule})
+async def get_rule_suggestion_api(request: RuleSuggestionRequest):
+    precomputed = await run_in_threadpool(get_precomputed_suggestion, request.table_name, request.column_name) if request.use_cache else None
+    if precomputed is not None:
+        return JSONResponse(content={"suggested_rule": precomputed["suggested_rule"], "precomputed": True})
+    try:
+        async with ai_limiter:
+            suggested_rule = await aget_rule_suggestion_on_column(request.column_name, request.table_name, request.existing_rules, request.use_cache)
+    except LimitExceeded as e:
+        return too_many_ai_requests(e)
+    return JSONResponse(content={"suggested_rule": suggested_rule, "precomputed": False})
+
+
+# Streams one suggestion per column as each completes, then a final summary
+@app.post("/get_rule_suggestions_batch/")
+async def get_rule_suggestions_batch_api(request: BatchRuleSuggestionRequest):
+    columns, unknown = await prepare_rule_suggestions_batch(request.table_name, request.column_names)
+    if columns is None:
+        return JSONResponse(status_code=404, content={"message": f"Table '{request.table_name}' not found."})
+    if unknown:
+        return JSONResponse(status_code=404, content={"message": f"Columns not found in '{request.table_name}': {', '.join(unknown)}."})
+
+    def encode(event, payload):
+        if request.format == "sse":
+            return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps(payload) + "\n"
+
+    async def stream():
+        errors = 0
+        async for result in astream_rule_suggestions(request.table_name, columns, request.use_cache):
+            errors += "error" in result
+            yield encode("suggestion", result)
+        yield encode("done", {"done": True, "columns": len(columns), "errors": errors})
+
+    media_type = "text/event-stream" if request.format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
+
+
+@app.get("/llm_cache/stats/")
+async def llm_cache_stats_api():
+    stats = await run_in_threadpool(llm_cache.stats)
+    return JSONResponse(content=stats)
+
+
+@app.get("/metrics")
+async def metrics_api():
+    text = await run_in_threadpool(REGISTRY.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/tool_cache/stats/")
+async def tool_cache_stats_api():
+    return JSONResponse(content=tool_cache.stats())
+
+
+@app.get("/ai_concurrency/")
+async def ai_concurrency_api():
+    return JSONResponse(content={"limiter": ai_limiter.stats(), "single_flight": single_flight.stats()})
+
+
+@app.delete("/llm_cache/")
+async def llm_cache_clear_api():
+    await run_in_threadpool(llm_cache.clear)
+    return JSONResponse(content={"message": "LLM cache cleared."})
+
+
+@app.get("/precomputed_suggestions/")
+async def precomputed_suggestions_api(table_name: str = Query(..., description="Table name", example="conventional_power_plants_DE")):
+    suggestions = await run_in_threadpool(get_precomputed_suggestions, table_name)
+    return JSONResponse(content={"suggestions": suggestions, "status": get_precompute_status(table_name)})
+
+
+@app.post("/precompute/")
+async def precompute_api(table_name: str = Query(..., description="Table name", example="conventional_power_plants_DE")):
+    queued = schedule_table(table_name)
+    message = f"Table '{table_name}' queued for pre-computation." if queued else f"Table '{table_name}' is already queued."
+    return JSONResponse(content={"message": message})
+
+
+@app.get("/precompute_status/")
+async def precompute_status_api(table_name: Optional[str] = Query(None, description="Table name", example="conventional_power_plants_DE")):
+    return JSONResponse(content={"status": get_precompute_status(table_name)})
 
 
 @app.get("/get_all_rules_of_table/")
-def get_all_rules_of_table_api(table_name: str = Query(..., description="Table name", example="customers")):
-    rules = get_all_rules_of_table(table_name)
+async def get_all_rules_of_table_api(table_name: str = Query(..., description="Table name", example="customers")):
+    rules = await run_in_threadpool(get_all_rules_of_table, table_name)
     return JSONResponse(content={"rules": rules})
 
 
+@app.post("/normalize_rules/")
+async def normalize_rules_api():
+    changed = await run_in_threadpool(normalize_stored_rules)
+    return JSONResponse(content={"message": f"{changed} rule queries rewritten to return rowids."})
+
+
+@app.get("/run_rules/")
+async def run_rules_api(table_name: str = Query(..., description="Table name", example="conventional_power_plants_DE"),
+                  with_rows: bool = Query(False, description="Keep the matching rows of every rule for paging/combining")):
+    results = await run_in_threadpool(run_rules_on_table, table_name, with_rows)
+    return JSONResponse(content=results)
+
+
+@app.get("/rule_result_rows/")
+async def rule_result_rows_api(handle: str = Query(..., description="Handle of a stored rule result"),
+                         offset: int = Query(0, description="Row offset (for pagination)"),
+                         limit: int = Query(100, description="Maximum number of row ids to return")):
+    page = await run_in_threadpool(page_result, handle, offset, limit)
+    if page is None:
+        return JSONResponse(status_code=404, content={"message": f"Rule result '{handle}' not found or expired."})
+    return JSONResponse(content=page)
+
+
+# The store keeps the MAX_RESULTS most recently used results, so under load a new one can be
+# evicted before its total is read; the client gets a 410 and can simply ask again
+def new_result_response(handle):
+    page = page_result(handle, 0, 0)
+    if page is None:
+        return JSONResponse(status_code=410, content={"message": f"Rule result '{handle}' expired before it could be read, try again."})
+    return JSONResponse(content={"handle": handle, "total": page["total"]})
+
+
+@app.post("/combine_rule_results/")
+async def combine_rule_results_api(request: CombineRuleResultsRequest):
+    handle = await run_in_threadpool(combine_results, request.handles, request.op)
+    if handle is None:
+        return JSONResponse(status_code=404, content={"message": "One or more rule results not found or expired."})
+    return new_result_response(handle)
+
+
+@app.get("/failing_rows/")
+async def failing_rows_api(table_name: str = Query(..., description="Table name", example="conventional_power_plants_DE"),
+                     rule_category: Optional[str] = Query(None, description="Only rules of this category", example="error")):
+    handle = await run_in_threadpool(rows_matching_any_rule, table_name, rule_category)
+    if handle is None:
+        return JSONResponse(status_code=404, content={"message": f"No stored rule results for '{table_name}', run /run_rules/ with with_rows first."})
+    return new_result_response(handle)
+
+
+@app.get("/profile/")
+async def profile_api(table_name: str = Query(..., description="Table name", example="conventional_power_plants_DE"),
+                column_name: Optional[str] = Query(None, description="Only return this column's profile", example="postcode"),
+                refresh: bool = Query(False, description="Recompute even if a profile of this table version exists")):
+    profile = await run_in_threadpool(get_profile_of_table, table_name, refresh)
+    if profile is None:
+        return JSONResponse(status_code=404, content={"message": f"Table '{table_name}' not found."})
+    if column_name is not None:
+        if column_name not in profile["columns"]:
+            return JSONResponse(status_code=404, content={"message": f"Column '{column_name}' not found in '{table_name}'."})
+        profile = {**profile, "columns": {column_name: profile["columns"][column_name]}}
+    return JSONResponse(content=profile)
+
+
 @app.post("/get_table_data/")
-def get_table_data_api(request: TableDataRequest):
-    columns, data = load_table_values(request.table_name, request.offset, request.limit)
+async def get_table_data_api(request: TableDataRequest):
+    try:
+        columns, data, next_cursor = await run_in_threadpool(load_table_values, request.table_name, request.offset, request.limit, request.cursor)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    return JSONResponse(content={"columns": columns, "rows": data, "next_cursor": next_cursor})
+
+
+@app.post("/get_rows_by_id/")
+async def get_rows_by_id_api(request: RowsByIdRequest):
+    columns, data = await run_in_threadpool(load_rows_by_rowid, request.table_name, request.row_ids)
     return JSONResponse(content={"columns": columns, "rows": data})
 
 
 @app.post("/get_col_data/")
-def get_col_data_api(request: ColumnDataRequest):
-    data = load_col_values(request.table_name, request.column_name, request.offset, request.limit)
-    return JSONResponse(content={"rows": data})
+async def get_col_data_api(request: ColumnDataRequest):
+    try:
+        data, next_cursor = await run_in_threadpool(load_col_values, request.table_name, request.column_name, request.offset, request.limit, request.cursor)
+    except LookupError as e:
+        return JSONResponse(status_code=404, content={"message": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    return JSONResponse(content={"rows": data, "next_cursor": next_cursor})
 
 
 @app.post("/chatbot/")
-def chatbot_api(request: ChatbotRequest):
-    response = chatbot.invoke(
-        {"messages": [HumanMessage(content=request.user_input)], "current_column": request.column_name},
-        config={"configurable": {"thread_id": "thread_id-1"}}
-    )
-    return JSONResponse(content={"AI Response": response["messages"][-1].content})
+async def chatbot_api(request: ChatbotRequest):
+    session_id = request.session_id or str(uuid.uuid4())
+    try:
+        async with ai_limiter:
+            response = await get_chatbot().ainvoke(
+                {"messages": [HumanMessage(content=request.user_input)], "current_column": request.column_name,
+                 "current_table": request.table_name},
+                config={"configurable": {"thread_id": session_id}}
+            )
+    except LimitExceeded as e:
+        return too_many_ai_requests(e)
+    await run_in_threadpool(checkpointer.touch_thread, session_id)
+    return JSONResponse(content={"AI Response": response["messages"][-1].content, "session_id": session_id,
+                                 "history_stats": response.get("history_stats")})
+
+
+@app.delete("/chatbot/session/")
+async def chatbot_session_delete_api(session_id: str = Query(..., description="Conversation to forget")):
+    await run_in_threadpool(checkpointer.delete_session, session_id)
+    return JSONResponse(content={"message": f"Session '{session_id}' deleted (if it existed)."})
+
+
+@app.get("/chatbot/sessions/stats/")
+async def chatbot_sessions_stats_api():
+    stats = await run_in_threadpool(checkpointer.session_stats)
+    return JSONResponse(content=stats)
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+# Gemini chunks carry either a string or a list of content parts
+def chunk_text(content):
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+# Streams the chatbot as Server-Sent Events:
+#   session     - {"session_id"} sent first, pass it back to continue the conversation
+#   token       - {"text"} piece of the answer as the model produces it
+#   tool_call   - {"name", "args"} the agent decided to call a tool
+#   tool_result - {"name", "content"} the tool finished (content truncated)
+#   done        - {"content", "session_id", "history_stats"} the full final answer
+#   error       - {"message"}
+@app.post("/chatbot/stream")
+async def chatbot_stream_api(request: ChatbotRequest):
+    try:
+        ai_limiter.check()
+    except LimitExceeded as e:
+        return too_many_ai_requests(e)
+
+    session_id = request.session_id or str(uuid.uuid4())
+
+    # The slot is taken inside the generator: a client that disconnects before the body
+    # starts never runs it, so a slot acquired in the handler would never be released
+    async def stream():
+        answer = ""
+        streamed = False
+        history_stats = None
+        yield sse_event("session", {"session_id": session_id})
+        try:
+            await ai_limiter.acquire()
+        except LimitExceeded as e:
+            yield sse_event("error", {"message": str(e)})
+            return
+        try:
+            async for mode, chunk in get_chatbot().astream(
+                {"messages": [HumanMessage(content=request.user_input)], "current_column": request.column_name,
+                 "current_table": request.table_name},
+                config={"configurable": {"thread_id": session_id}},
+                stream_mode=["messages", "updates"],
+            ):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if metadata.get("langgraph_node") == "chat_node" and isinstance(message, AIMessageChunk):
+                        text = chunk_text(message.content)
+                        if text:
+                            streamed = True
+                            yield sse_event("token", {"text": text})
+                    continue
+
+                # The chat_node update carries the whole reply: it is the final answer, and the
+                # only token a model that doesn't stream (e.g. the fake provider) ever sends
+                for node, update in chunk.items():
+                    if node == "chat_node" and update:
+                        history_stats = update.get("history_stats", history_stats)
+                    for message in (update or {}).get("messages", []):
+                        if node == "chat_node":
+                            tool_calls = getattr(message, "tool_calls", None) or []
+                            for tool_call in tool_calls:
+                                yield sse_event("tool_call", {"name": tool_call["name"], "args": tool_call["args"]})
+                            if not tool_calls:
+                                answer = chunk_text(message.content)
+                                if answer and not streamed:
+                                    yield sse_event("token", {"text": answer})
+                        elif node == "tools":
+                            yield sse_event("tool_result", {"name": message.name, "content": chunk_text(message.content)[:500]})
+                    if node == "chat_node":
+                        streamed = False
+            await run_in_threadpool(checkpointer.touch_thread, session_id)
+            yield sse_event("done", {"content": answer, "session_id": session_id, "history_stats": history_stats})
+        except Exception as e:
+            yield sse_event("error", {"message": f"{type(e).__name__}: {e}"})
+        finally:
+            ai_limiter.release()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,161 @@
+import functools
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# ------------------------------------------ metrics ----------------------------------------------
+# Small in-process metrics registry rendered in the Prometheus text format at /metrics.
+# Counters and histograms are updated where the work happens (endpoints, LangGraph nodes,
+# LLM calls, SQL statements, pipeline stages); collectors read gauges such as cache hit
+# ratios from the existing stats() methods at scrape time.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, _labels_text(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            # Buckets are cumulative: every bound the value fits under is counted
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    # Time a block: with histogram.time(stage="x"): ...
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        samples = []
+        for key, (counts, total, count) in sorted(values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                samples.append((self.name + "_bucket", _labels_text(self.labelnames, key, [("le", _number(bound))]), bucket_count))
+            samples.append((self.name + "_bucket", _labels_text(self.labelnames, key, [("le", "+Inf")]), count))
+            samples.append((self.name + "_sum", _labels_text(self.labelnames, key), total))
+            samples.append((self.name + "_count", _labels_text(self.labelnames, key), count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    # fn() returns [(name, help, type, [(labels dict, value), ...]), ...], read at every scrape
+    def register_collector(self, fn):
+        self._collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {type(e).__name__}")
+                continue
+            for name, help_text, metric_type, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_labels_text(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("dq_http_request_seconds", "Latency of API requests", ["method", "route", "status"])
+GRAPH_NODE_SECONDS = REGISTRY.histogram("dq_graph_node_seconds", "Latency of LangGraph nodes", ["node", "status"])
+LLM_CALL_SECONDS = REGISTRY.histogram("dq_llm_call_seconds", "Latency of LLM calls", ["model", "status"])
+LLM_TOKENS = REGISTRY.counter("dq_llm_tokens_total", "LLM tokens used", ["model", "type"])
+SQL_STATEMENT_SECONDS = REGISTRY.histogram("dq_sql_statement_seconds", "Time spent executing and fetching SQL statements", ["operation"])
+STAGE_SECONDS = REGISTRY.histogram("dq_stage_seconds", "Latency of pipeline stages", ["stage"])
+
+
+def sql_operation(query):
+    match = re.match(r"\s*(\w+)", query or "")
+    return match.group(1).lower() if match else "unknown"
+
+
+# Decorator: record a function's latency under dq_stage_seconds{stage=...}
+def timed_stage(stage):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(stage=stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,227 @@
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from data_access import fetch_all, fetch_one, execute
+from utils import (
+    engine_rules, catalog_source,
+    get_schema_of_table, get_columns_of_table, get_profile_of_table,
+    get_rule_suggestion_on_column, aget_rule_suggestion_on_column, get_existing_rules_on_column
+)
+from concurrency import ai_limiter
+
+# ------------------------------------------ background pre-computation ----------------------------------------------
+# A single worker thread picks up tables as soon as they appear or change in the source
+# database and gets everything the rule creation page needs ready ahead of time: the
+# schema, the column profiles and one rule suggestion per column. A watcher thread polls
+# the catalog's per-table versions to notice new or changed tables.
+# Suggestions cost one LLM call per column, so tables the watcher finds only get them with
+# PRECOMPUTE_SUGGESTIONS=1 (an explicit /precompute/ always asks for them), and the worker
+# makes at most PRECOMPUTE_LLM_CALLS_PER_HOUR of those calls. They run on the server's
+# event loop, sharing single_flight and ai_limiter with the API's own suggestion calls.
+
+PRECOMPUTE_POLL_SECONDS = int(os.getenv("PRECOMPUTE_POLL_SECONDS", "60"))
+PRECOMPUTE_SUGGESTIONS = os.getenv("PRECOMPUTE_SUGGESTIONS", "0") == "1"
+PRECOMPUTE_LLM_CALLS_PER_HOUR = int(os.getenv("PRECOMPUTE_LLM_CALLS_PER_HOUR", "100"))
+
+_jobs = queue.Queue()
+_pending = {}
+_status = {}
+_llm_calls = collections.deque()
+_lock = threading.Lock()
+_started = False
+_loop = None
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Suggestions depend on the rules already on the column, so they are stored with a hash of them
+def _rules_hash(existing_rules):
+    return hashlib.sha1(json.dumps(sorted(existing_rules)).encode()).hexdigest()[:16]
+
+
+def _ensure_suggestion_storage():
+    execute(engine_rules, """
+        CREATE TABLE IF NOT EXISTS rule_suggestions (
+            table_name TEXT,
+            column_name TEXT,
+            table_version TEXT,
+            rules_hash TEXT,
+            suggestion TEXT,
+            created_at TEXT,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """)
+
+
+def save_suggestion(table_name, column_name, table_version, existing_rules, suggestion):
+    _ensure_suggestion_storage()
+    execute(
+        engine_rules,
+        "INSERT OR REPLACE INTO rule_suggestions (table_name, column_name, table_version, rules_hash, suggestion, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (table_name, column_name, table_version, _rules_hash(existing_rules), suggestion, _now()),
+    )
+
+
+# Get the stored suggestion of a column, if it is still valid for the table version and the column's rules
+def get_precomputed_suggestion(table_name, column_name):
+    _ensure_suggestion_storage()
+    stored = fetch_one(
+        engine_rules,
+        "SELECT table_version, rules_hash, suggestion FROM rule_suggestions WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name),
+    )
+    if stored is None or stored[2] is None:
+        return None
+    table_version, rules_hash, suggestion = stored
+    if table_version != catalog_source.table_version(table_name):
+        return None
+    if rules_hash != _rules_hash(get_existing_rules_on_column(column_name, table_name)):
+        return None
+    return {"suggested_rule": suggestion}
+
+
+def get_precomputed_suggestions(table_name):
+    _ensure_suggestion_storage()
+    rows = fetch_all(
+        engine_rules,
+        "SELECT column_name, suggestion, table_version, created_at FROM rule_suggestions WHERE table_name = ?",
+        (table_name,),
+    )
+    table_version = catalog_source.table_version(table_name)
+    return [
+        {"column_name": column, "suggested_rule": suggestion, "created_at": created_at}
+        for column, suggestion, version, created_at in rows
+        if version == table_version and suggestion is not None
+    ]
+
+
+# Take one LLM call from the hourly budget, False when it is used up
+def _take_llm_call():
+    now = time.monotonic()
+    with _lock:
+        while _llm_calls and now - _llm_calls[0] > 3600:
+            _llm_calls.popleft()
+        if len(_llm_calls) >= PRECOMPUTE_LLM_CALLS_PER_HOUR:
+            return False
+        _llm_calls.append(now)
+        return True
+
+
+async def _asuggest(column_name, table_name, existing_rules):
+    async with ai_limiter:
+        return await aget_rule_suggestion_on_column(column_name, table_name, existing_rules)
+
+
+# Same path as /get_rule_suggestion/ when the server loop is known, so a column the API is
+# already asking about shares that call; without one (scripts) the blocking version
+def _suggest(column_name, table_name, existing_rules):
+    if _loop is None:
+        return get_rule_suggestion_on_column(column_name, table_name, existing_rules)
+    return asyncio.run_coroutine_threadsafe(_asuggest(column_name, table_name, existing_rules), _loop).result()
+
+
+# Precompute everything for one table; suggestions=False stops after the schema and profile
+def precompute_table(table_name, suggestions=True):
+    table_version = catalog_source.table_version(table_name)
+    if table_version is None:
+        return
+    with _lock:
+        status = _status.get(table_name, {})
+        if status.get("table_version") == table_version and status.get("state") == "done" and (status.get("suggestions") or not suggestions):
+            return
+        _status[table_name] = {"state": "running", "table_version": table_version, "suggestions": suggestions, "started_at": _now(), "errors": {}}
+
+    get_schema_of_table(table_name)
+    get_profile_of_table(table_name)
+
+    errors = {}
+    skipped = []
+    for column_name in get_columns_of_table(table_name) if suggestions else []:
+        if get_precomputed_suggestion(table_name, column_name) is not None:
+            continue
+        if not _take_llm_call():
+            skipped.append(column_name)
+            continue
+        try:
+            existing_rules = get_existing_rules_on_column(column_name, table_name)
+            suggestion = _suggest(column_name, table_name, existing_rules)
+            # No usable answer: leave it to the next request instead of serving None until the data changes
+            if suggestion is not None:
+                save_suggestion(table_name, column_name, table_version, existing_rules, suggestion)
+        except Exception as e:
+            errors[column_name] = str(e)
+
+    with _lock:
+        # Columns over the LLM budget are left for the next run; the table isn't marked done for them
+        _status[table_name].update({"state": "done", "finished_at": _now(), "errors": errors, "skipped_over_budget": skipped})
+        if skipped:
+            _status[table_name]["suggestions"] = False
+
+
+# Queue a table for pre-computation (no-op if it is already waiting with the same or more work)
+def schedule_table(table_name, suggestions=True):
+    with _lock:
+        if table_name in _pending:
+            if not suggestions or _pending[table_name]:
+                return False
+            _pending[table_name] = True
+            return True
+        _pending[table_name] = suggestions
+        _status.setdefault(table_name, {"state": "queued", "table_version": None, "errors": {}})
+    _jobs.put(table_name)
+    return True
+
+
+def get_precompute_status(table_name=None):
+    with _lock:
+        if table_name is not None:
+            return dict(_status.get(table_name, {"state": "unknown"}))
+        return {table: dict(status) for table, status in _status.items()}
+
+
+def _worker():
+    while True:
+        table_name = _jobs.get()
+        with _lock:
+            suggestions = _pending.pop(table_name, True)
+        try:
+            precompute_table(table_name, suggestions)
+        except Exception as e:
+            with _lock:
+                _status[table_name] = {**_status.get(table_name, {}), "state": "failed", "error": str(e), "finished_at": _now()}
+
+
+def _watcher():
+    known_versions = {}
+    while True:
+        try:
+            tables = catalog_source.list_tables()
+            for table_name in tables:
+                table_version = catalog_source.table_version(table_name)
+                if known_versions.get(table_name) != table_version:
+                    known_versions[table_name] = table_version
+                    schedule_table(table_name, suggestions=PRECOMPUTE_SUGGESTIONS)
+        except Exception as e:
+            print(f"Precompute watcher failed: {e}")
+        time.sleep(PRECOMPUTE_POLL_SECONDS)
+
+
+# Start the worker and watcher threads (once per process); loop is the server's event loop
+def start_precompute(loop=None):
+    global _started, _loop
+    with _lock:
+        if _started:
+            return
+        _started = True
+        _loop = loop
+    threading.Thread(target=_worker, name="precompute-worker", daemon=True).start()
+    threading.Thread(target=_watcher, name="precompute-watcher", daemon=True).start()
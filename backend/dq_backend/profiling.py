@@ -0,0 +1,302 @@
+import itertools
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from data_access import quote_identifier, fetch_all, fetch_one, execute, iter_rows
+from sketches import SpaceSaving, pattern_class
+from singleflight import single_flight
+
+# ------------------------------------------ column profiling ----------------------------------------------
+# Profiles every column of a table: null/empty rates, distinct count, top values, min/max/mean,
+# value types, string length histogram and pattern classes. Counts, min/max/mean and distinct
+# counts are SQL aggregates (one scan per AGGREGATE_COLUMNS columns); a second pass counts each
+# batch of rows per column and only feeds the distinct values of the batch to the sketches.
+# Profiles are keyed by the catalog's table version and persisted in the rules database,
+# so rule suggestion and chat read precomputed stats instead of scanning the table again.
+# Top values are exact (NULL included) when a column has at most TOP_K distinct values or
+# the table has at most EXACT_TOP_VALUES_ROWS rows; otherwise they come from the sketch and
+# each count may be over by up to top_values_max_error.
+
+TOP_K = 200
+EXACT_TOP_VALUES_ROWS = int(os.getenv("PROFILE_EXACT_TOP_VALUES_ROWS", "200000"))
+TOP_PATTERNS = 20
+MAX_TRACKED_LENGTH = 100
+# Columns per aggregate query (5 result columns each, SQLite allows 2000) and rows per batch
+AGGREGATE_COLUMNS = 300
+BATCH_ROWS = 10_000
+PATTERN_MEMO_SIZE = 50_000
+
+_profiles = {}
+_lock = threading.Lock()
+
+_VALUE_TYPES = {int: "integer", float: "real", str: "text", bytes: "blob"}
+
+
+# Row count and per column non-null count, min, max, mean and distinct count. SQLite orders
+# numbers before text before blobs, so plain MIN/MAX/AVG are only right for single-typed
+# columns; _mixed_type_ranges redoes the others once the value types are known
+def _aggregate_columns(engine, table_name, column_names):
+    stats = {}
+    row_count = 0
+    for start in range(0, max(len(column_names), 1), AGGREGATE_COLUMNS):
+        chunk = column_names[start:start + AGGREGATE_COLUMNS]
+        select_list = ", ".join(["COUNT(*)"] + [
+            f"COUNT({q}), MIN({q}), MAX({q}), AVG({q}), COUNT(DISTINCT {q})"
+            for q in map(quote_identifier, chunk)
+        ])
+        row = fetch_one(engine, f"SELECT {select_list} FROM {quote_identifier(table_name)}")
+        row_count = row[0]
+        for index, name in enumerate(chunk):
+            non_null, low, high, mean, distinct = row[1 + index * 5:6 + index * 5]
+            stats[name] = {"non_null": non_null, "min": low, "max": high, "mean": mean, "distinct": distinct}
+    return row_count, stats
+
+
+# Numeric min/max/mean of columns mixing numbers with text or blobs, text min/max of
+# text columns that also hold blobs - in one scan, and only for those columns
+def _mixed_type_ranges(engine, table_name, profilers, stats):
+    numeric, text = [], []
+    for profiler in profilers:
+        types = profiler.types
+        if types["integer"] + types["real"] and types["text"] + types["blob"]:
+            numeric.append(profiler.name)
+        elif types["text"] and types["blob"]:
+            text.append(profiler.name)
+    if not numeric and not text:
+        return
+    select_list = []
+    for q in map(quote_identifier, numeric):
+        value = f"CASE WHEN typeof({q}) IN ('integer', 'real') THEN {q} END"
+        select_list.append(f"MIN({value}), MAX({value}), AVG({value})")
+    for q in map(quote_identifier, text):
+        value = f"CASE WHEN typeof({q}) = 'text' THEN {q} END"
+        select_list.append(f"MIN({value}), MAX({value}), NULL")
+    row = fetch_one(engine, f"SELECT {', '.join(select_list)} FROM {quote_identifier(table_name)}")
+    for index, name in enumerate(numeric + text):
+        low, high, mean = row[index * 3:index * 3 + 3]
+        stats[name].update({"min": low, "max": high, "mean": mean})
+
+
+class ColumnProfiler:
+    def __init__(self, name, declared_type, stats, row_count):
+        self.name = name
+        self.declared_type = declared_type
+        self.types = {"integer": 0, "real": 0, "text": 0, "blob": 0}
+        self.empty = 0
+        self.lengths = {}
+        self.patterns = SpaceSaving(TOP_PATTERNS)
+        self._pattern_memo = {}
+        # Few distinct values: count them all. Small tables and mostly-unique columns (where
+        # the sketch would evict on nearly every value and find nothing) get exact top values
+        # from SQL afterwards (see profile_table); only the rest needs the sketch
+        self.unique = stats["distinct"] == stats["non_null"]
+        self.exact_counts = Counter() if stats["distinct"] <= TOP_K else None
+        self.top_values = None
+        mostly_unique = stats["distinct"] * 2 > stats["non_null"]
+        if self.exact_counts is None and not mostly_unique and row_count > EXACT_TOP_VALUES_ROWS:
+            self.top_values = SpaceSaving(TOP_K)
+
+    # values: this column's values in one batch of rows
+    def add_batch(self, values):
+        counts = Counter(values)
+        counts.pop(None, None)
+        if self.exact_counts is not None:
+            self.exact_counts.update(counts)
+        for value, n in counts.items():
+            if self.top_values is not None:
+                self.top_values.add(value, n)
+            value_type = _VALUE_TYPES.get(type(value), "integer")
+            self.types[value_type] += n
+            if value_type != "text":
+                continue
+            if not value.strip():
+                self.empty += n
+            length = min(len(value), MAX_TRACKED_LENGTH + 1)
+            self.lengths[length] = self.lengths.get(length, 0) + n
+            pattern = self._pattern_memo.get(value)
+            if pattern is None:
+                if len(self._pattern_memo) >= PATTERN_MEMO_SIZE:
+                    self._pattern_memo.clear()
+                pattern = self._pattern_memo[value] = pattern_class(value)
+            self.patterns.add(pattern, n)
+
+    # Top values and the largest possible overcount. The sketch only overestimates once it
+    # had to evict a value, which leaves a non-zero error behind
+    def _top_values(self):
+        if self.exact_counts is not None:
+            return [[value, count] for value, count in self.exact_counts.most_common(TOP_K)], 0
+        top = self.top_values.top() if self.top_values is not None else []
+        max_error = max((error for _, _, error in top), default=0)
+        return [[value, count] for value, count, _ in top], max_error
+
+    def result(self, row_count, stats, exact_top_values=None):
+        count = row_count or 1
+        nulls = row_count - stats["non_null"]
+        if exact_top_values is not None:
+            top_values, max_error = exact_top_values, 0
+        else:
+            top_values, max_error = self._top_values()
+            if nulls:
+                top_values = sorted(top_values + [[None, nulls]], key=lambda item: item[1], reverse=True)[:TOP_K]
+        numeric = self.types["integer"] + self.types["real"] > 0
+        return {
+            "declared_type": self.declared_type,
+            "count": row_count,
+            "null_count": nulls,
+            "null_percentage": nulls * 100 / count,
+            "empty_count": self.empty,
+            "empty_percentage": self.empty * 100 / count,
+            "distinct_count": stats["distinct"],
+            "value_types": self.types,
+            "min": stats["min"],
+            "max": stats["max"],
+            "mean": stats["mean"] if numeric else None,
+            "top_values": top_values,
+            "top_values_exact": max_error == 0,
+            "top_values_max_error": max_error,
+            "length_histogram": {
+                (f">{MAX_TRACKED_LENGTH}" if length > MAX_TRACKED_LENGTH else str(length)): n
+                for length, n in sorted(self.lengths.items())
+            },
+            "patterns": [[pattern, count] for pattern, count, _ in self.patterns.top()],
+        }
+
+
+# Exact top values of a column, NULL group included. In a unique column every value occurs
+# once, so any TOP_K of them are the top values and no GROUP BY is needed
+def _exact_top_values(engine, table_name, column_name, unique=False, nulls=0):
+    column = quote_identifier(column_name)
+    if unique:
+        rows = fetch_all(engine, f"SELECT {column} FROM {quote_identifier(table_name)} WHERE {column} IS NOT NULL LIMIT ?", (TOP_K,))
+        values = [[value, 1] for value, in rows]
+        return sorted(values + [[None, nulls]], key=lambda item: item[1], reverse=True)[:TOP_K] if nulls else values
+    rows = fetch_all(engine, f"SELECT {column}, COUNT(*) FROM {quote_identifier(table_name)} GROUP BY {column} ORDER BY 2 DESC LIMIT ?", (TOP_K,))
+    return [[value, count] for value, count in rows]
+
+
+# Profile all columns of a table: the aggregate scan, one pass for types, lengths, patterns
+# and top values, then exact top values for small tables where only a GROUP BY gives them
+def profile_table(engine, table_name):
+    columns = fetch_all(engine, f"PRAGMA table_info({quote_identifier(table_name)})")
+    if not columns:
+        return None
+    row_count, stats = _aggregate_columns(engine, table_name, [col[1] for col in columns])
+    profilers = [ColumnProfiler(col[1], col[2], stats[col[1]], row_count) for col in columns]
+
+    select_list = ", ".join(quote_identifier(p.name) for p in profilers)
+    rows = iter_rows(engine, f"SELECT {select_list} FROM {quote_identifier(table_name)}")
+    while True:
+        batch = list(itertools.islice(rows, BATCH_ROWS))
+        if not batch:
+            break
+        for profiler, values in zip(profilers, zip(*batch)):
+            profiler.add_batch(values)
+    _mixed_type_ranges(engine, table_name, profilers, stats)
+
+    results = {}
+    for profiler in profilers:
+        exact = None
+        if profiler.exact_counts is None and profiler.top_values is None:
+            nulls = row_count - stats[profiler.name]["non_null"]
+            exact = _exact_top_values(engine, table_name, profiler.name, profiler.unique, nulls)
+        results[profiler.name] = profiler.result(row_count, stats[profiler.name], exact)
+
+    return {
+        "table_name": table_name,
+        "row_count": row_count,
+        "profiled_at": datetime.now(timezone.utc).isoformat(),
+        "columns": results,
+    }
+
+
+def _ensure_profile_storage(store_engine):
+    execute(store_engine, """
+        CREATE TABLE IF NOT EXISTS table_profiles (
+            table_name TEXT,
+            table_version TEXT,
+            profile TEXT,
+            created_at TEXT,
+            PRIMARY KEY (table_name, table_version)
+        )
+    """)
+
+
+# Get the profile of a table version (see Catalog.table_version) - from memory, then storage,
+# else computed and persisted. Concurrent cold requests for one version share a single scan
+def get_table_profile(engine, store_engine, table_name, table_version, refresh=False):
+    if table_version is None:
+        return None
+
+    key = (table_name, table_version)
+    if not refresh:
+        with _lock:
+            if key in _profiles:
+                return _profiles[key]
+        _ensure_profile_storage(store_engine)
+        stored = fetch_one(
+            store_engine,
+            "SELECT profile FROM table_profiles WHERE table_name = ? AND table_version = ?",
+            key,
+        )
+        if stored:
+            profile = json.loads(stored[0])
+            with _lock:
+                _profiles[key] = profile
+            return profile
+
+    return single_flight.do("profile", ("profile",) + key, _compute_profile, engine, store_engine, table_name, table_version)
+
+
+def _compute_profile(engine, store_engine, table_name, table_version):
+    key = (table_name, table_version)
+    profile = profile_table(engine, table_name)
+    profile["table_version"] = table_version
+    serialized = json.dumps(profile, default=str)
+    profile = json.loads(serialized)
+    _ensure_profile_storage(store_engine)
+    execute(store_engine, "DELETE FROM table_profiles WHERE table_name = ?", (table_name,))
+    execute(
+        store_engine,
+        "INSERT INTO table_profiles (table_name, table_version, profile, created_at) VALUES (?, ?, ?, ?)",
+        (table_name, table_version, serialized, profile["profiled_at"]),
+    )
+    with _lock:
+        for old_key in [k for k in _profiles if k[0] == table_name]:
+            del _profiles[old_key]
+        _profiles[key] = profile
+    return profile
+
+
+def _estimate_note(column):
+    if column.get("top_values_exact", True):
+        return ""
+    return f" (estimated counts, each may be over by up to {column['top_values_max_error']})"
+
+
+# Top values of a column as (value, count) pairs for prompts, with a note when the counts are estimates
+def describe_top_values(profile, column_name):
+    column = (profile or {}).get("columns", {}).get(column_name)
+    if column is None:
+        return []
+    values = [tuple(value) for value in column["top_values"]]
+    note = _estimate_note(column)
+    return f"{values}{note}" if note else values
+
+
+# Short text version of a column profile for prompts
+def format_column_profile(profile, column_name, top=20):
+    column = (profile or {}).get("columns", {}).get(column_name)
+    if column is None:
+        return "No profile available."
+    lines = [
+        f"rows: {column['count']}, nulls: {column['null_count']} ({column['null_percentage']:.2f}%), "
+        f"empty: {column['empty_count']} ({column['empty_percentage']:.2f}%)",
+        f"distinct: {column['distinct_count']}",
+        f"min: {column['min']}, max: {column['max']}, mean: {column['mean']}",
+        f"lengths: {column['length_histogram']}",
+        f"patterns: {column['patterns'][:10]}",
+        f"top values: {column['top_values'][:top]}" + _estimate_note(column),
+    ]
+    return "\n".join(lines)
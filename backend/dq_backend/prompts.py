@@ -34,6 +34,9 @@ You are a helpful AI assistant that helps users explore and understand better ab
 The column user is interested to know more and form data quality rules is - '{current_column}'
 
 You have access to the table, and you also have necessary tools to query the table, use them whenever necessary.
+Precomputed statistics of the column are given below. Answer from them when they cover the question (null %, distinct count, min/max, top values) instead of querying the table:
+{column_profile}
+For the same statistics of other columns use the column_profile tool.
 
 Your job is to:
 1. Explain what the column contains in simple, non-technical language.
@@ -55,6 +58,16 @@ RULE: [Your rule here]
 Your role is to act like a friendly guide: explain, show small pieces of data, and help the user get insights and create data quality rules on a column step by step.
 """
 
+# Used for folding older chat turns into a running summary
+summarize_chat_prompt = """
+You keep a running summary of a conversation between a user and a data quality assistant about the column '{current_column}'.
+Summary so far:
+{summary}
+
+Extend the summary with the conversation below. Keep facts the assistant found about the data (counts, values, percentages),
+rules that were suggested or agreed on, and open questions. Drop greetings and raw query output. Answer with the summary only, at most 200 words.
+"""
+
 # Used for generating SQL queries
 generate_query_system_prompt_count = """
 You are an expert in SQL and Data Quality rules.
@@ -89,16 +102,17 @@ Table: {table_name}
 Column: {column_name}
 
 Rules for query generation:
-1. The query MUST return only the row numbers of rows that FOLLOW the rule and not of rows that VIOLATE the rule (i.e., rows that satisfy the condition).
-2. Use ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) to generate row numbers.
-3. The query result must be a single column named row_num.
+1. The query MUST return only the row ids of rows that FOLLOW the rule and not of rows that VIOLATE the rule (i.e., rows that satisfy the condition).
+2. Select the table's rowid to identify rows. Do NOT use ROW_NUMBER() or any other window function.
+3. The query result must be a single column, rowid.
 4. Do NOT return actual column values.
-5. Do NOT run the query; just generate it.
+5. Use the form SELECT rowid FROM <table> WHERE <condition>, without joins, grouping, ordering or limits.
+6. Do NOT run the query; just generate it.
 
 Below is one example you can use for reference - 
 COLUMN: postcode
 RULE:  The 'postcode' column should always contain values that are exactly 5 characters long.
-QUERY:  SELECT ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS row_num FROM conventional_power_plants_DE WHERE LENGTH(postcode) != 5
+QUERY:  SELECT rowid FROM conventional_power_plants_DE WHERE LENGTH(postcode) != 5
 If the requirement is unclear, ask a clarifying question to the user before generating the query.
 
 Output must be in exactly one of the following formats:
@@ -0,0 +1,36 @@
+import hashlib
+import threading
+
+# ------------------------------------------ shared clients ----------------------------------------------
+# Process-wide registry for expensive objects (LLM clients, SQLAlchemy engines, compiled
+# LangGraph graphs). Each is built once per key and reused by every request, so HTTP
+# keep-alive to the model endpoint and the DB connection pool survive across calls.
+
+_objects = {}
+# Reentrant: a factory may build what it depends on through get_shared (an agent its LLM client)
+_lock = threading.RLock()
+
+
+def get_shared(key, factory):
+    obj = _objects.get(key)
+    if obj is not None:
+        return obj
+    with _lock:
+        obj = _objects.get(key)
+        if obj is None:
+            obj = factory()
+            _objects[key] = obj
+        return obj
+
+
+def drop_shared(key=None):
+    with _lock:
+        if key is None:
+            _objects.clear()
+        else:
+            _objects.pop(key, None)
+
+
+# Short hash of prompt texts, so editing a prompt builds a new graph instead of reusing the old one
+def prompt_version(*prompts):
+    return hashlib.sha1("\x00".join(prompts).encode()).hexdigest()[:12]
@@ -0,0 +1,284 @@
+import re
+from data_access import quote_identifier
+
+# ------------------------------------------ deterministic rule compiler ----------------------------------------------
+# Turns common natural language rules (not null, length, numeric range, allowed values,
+# simple formats, uniqueness) into SQL without calling the LLM. Like the example in
+# generate_query_system_prompt, the query selects the rowids of rows that break the rule.
+# Anything ambiguous - no pattern, several patterns, another column mentioned, or a negation
+# a matcher doesn't implement ("must not be one of ...") - returns None so the caller falls
+# back to the agent. So do length and format rules on columns without TEXT affinity: LENGTH()
+# and LIKE read a number's text form, so "4 digits" would flag every 2003.0.
+
+_NUMBER = r"-?\d+(?:\.\d+)?"
+_LENGTH_UNITS = r"(?:characters?|chars?|digits?|letters?|symbols?)"
+_NULLISH = r"(?:null|empty|blank|missing|none)"
+_NEGATION = r"\b(?:not|never|no|cannot|can't|shouldn't|mustn't|isn't|aren't|doesn't|don't|without)\b"
+
+# Returned by a matcher that recognises its pattern but not the (negated) form it is in
+_DECLINE = object()
+
+# Qualifier phrases in front of a number and the comparison that breaks them,
+# checked negated and longest phrases first
+_BOUNDS = [
+    (r"(?:not|never) (?:be )?(?:more|greater|higher|larger|longer|above|over) than", ">"),
+    (r"(?:not|never) (?:be )?(?:less|lower|smaller|shorter|fewer|below|under) than", "<"),
+    (r"(?:at most|no more than|not exceed|not be over|maximum(?: of)?|max(?:imum)? of|up to|less than or equal to|<=)", ">"),
+    (r"(?:at least|no less than|minimum(?: of)?|min(?:imum)? of|greater than or equal to|>=)", "<"),
+    (r"(?:less than|fewer than|lower than|smaller than|shorter than|below|under|<)", ">="),
+    (r"(?:more than|greater than|higher than|larger than|longer than|above|over|>)", "<="),
+]
+
+
+def _string_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _literal(value):
+    if re.fullmatch(_NUMBER, value):
+        return value
+    return _string_literal(value)
+
+
+# Whether a negation is left once the phrases a matcher implements itself are taken out
+def _negated(text, *handled):
+    for phrase in handled:
+        text = re.sub(phrase, " ", text)
+    return re.search(_NEGATION, text) is not None
+
+
+def _normalize_rule(rule):
+    text = rule.strip()
+    text = re.sub(r"^\s*rule\s*:\s*", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\s+", " ", text).strip().rstrip(".!;")
+    return text
+
+
+def _bound_before(text, end):
+    window = text[max(0, end - 40):end].rstrip()
+    for phrase, violation in _BOUNDS:
+        if re.search(rf"(?:^|\b|\s){phrase}\s*(?:of\s*)?(?:be\s*)?$", window):
+            return violation
+    return None
+
+
+# Every qualifier phrase of _BOUNDS, negated ones included, as the matchers implement them
+_BOUND_PHRASES = r"(?:" + "|".join(phrase for phrase, _ in _BOUNDS) + r")"
+
+
+# --------------------------------------------- matchers ---------------------------------------------------------
+# Each matcher gets the lowercased rule (original text in `raw`) and the quoted column,
+# and returns a violation predicate, None, or _DECLINE when the rule is the negated form.
+
+def _match_not_null(text, raw, col):
+    negated = re.search(rf"\b(?:not|never|no|cannot|can't|shouldn't|mustn't|without)\b(?: \w+){{0,4}} {_NULLISH}\b", text)
+    required = re.search(r"\b(?:required|mandatory|must be (?:filled|populated|present)|always (?:have|contain) a value)\b", text)
+    if not (negated or required):
+        return None
+    if re.search(r"\b(?:empty|blank)\b", text):
+        return f"{col} IS NULL OR TRIM({col}) = ''"
+    return f"{col} IS NULL"
+
+
+def _match_length(text, raw, col):
+    match = re.search(rf"\b(\d+)\s*{_LENGTH_UNITS}\b", text)
+    if match is None:
+        match = re.search(r"\blength\b(?: \w+){0,4}? (\d+)\b", text)
+    if match is None:
+        return None
+    if _negated(text, _BOUND_PHRASES):
+        return _DECLINE
+    n = int(match.group(1))
+    violation = _bound_before(text, match.start(1))
+    if violation is None:
+        return f"LENGTH({col}) != {n}"
+    return f"LENGTH({col}) {violation} {n}"
+
+
+def _match_range(text, raw, col):
+    predicate = _range_predicate(text, raw, col)
+    if predicate is not None and _negated(text, _BOUND_PHRASES, r"\bnon-(?:negative|positive)\b", r"\bnot (?:be )?negative\b"):
+        return _DECLINE
+    return predicate
+
+
+def _range_predicate(text, raw, col):
+    if re.search(rf"\b{_LENGTH_UNITS}\b|\blength\b", text):
+        return None
+    between = re.search(rf"\bbetween ({_NUMBER}) and ({_NUMBER})\b", text)
+    if between:
+        low, high = sorted((between.group(1), between.group(2)), key=float)
+        return f"CAST({col} AS REAL) NOT BETWEEN {low} AND {high}"
+    if re.search(r"\b(?:non-negative|not (?:be )?negative|zero or (?:more|positive))\b", text):
+        return f"CAST({col} AS REAL) < 0"
+    if re.search(r"\bnon-positive\b", text):
+        return f"CAST({col} AS REAL) > 0"
+    if re.search(r"\bpositive\b", text):
+        return f"CAST({col} AS REAL) <= 0"
+    if re.search(r"\bnegative\b", text):
+        return f"CAST({col} AS REAL) >= 0"
+    bounds = []
+    for match in re.finditer(_NUMBER, text):
+        violation = _bound_before(text, match.start())
+        if violation is not None:
+            bounds.append(f"CAST({col} AS REAL) {violation} {match.group(0)}")
+    if len(bounds) != 1:
+        return None
+    return bounds[0]
+
+
+def _match_allowed_values(text, raw, col):
+    match = re.search(
+        r"\b(?:be one of|one of|allowed values (?:are|is)|valid values (?:are|is)|must be in|should be in|be either|is either|are either)"
+        r"(?:\s+the(?:\s+following)?(?:\s+values)?)?\s*:?\s*(.+)$",
+        text,
+    )
+    if match is None:
+        return None
+    if _negated(text[:match.start(1)]):
+        return _DECLINE
+    # Take the values from the original text to keep their case
+    listing = raw[match.start(1):].strip().strip("()[]{}")
+    values = [v.strip().strip("'\"`") for v in re.split(r",|\bor\b|\band\b", listing, flags=re.IGNORECASE)]
+    values = [v for v in values if v]
+    if len(values) < 2 or any(len(v.split()) > 3 for v in values):
+        return None
+    return f"{col} NOT IN ({', '.join(_literal(v) for v in values)})"
+
+
+# Translate a simple regex (anchors, literals, \d, character classes, {n}) into a GLOB pattern
+def _regex_to_glob(pattern):
+    if not (pattern.startswith("^") and pattern.endswith("$")):
+        return None
+    body = pattern[1:-1]
+    parts = []
+    i = 0
+    while i < len(body):
+        ch = body[i]
+        if ch == "\\" and i + 1 < len(body):
+            escaped = body[i + 1]
+            if escaped == "d":
+                token = "[0-9]"
+            elif escaped in ".-_/ @+()":
+                token = escaped
+            else:
+                return None
+            i += 2
+        elif ch == "[":
+            end = body.find("]", i)
+            if end == -1:
+                return None
+            inner = body[i + 1:end].replace("\\d", "0-9")
+            if "\\" in inner:
+                return None
+            token = "[^" + inner[1:] + "]" if inner.startswith("^") else "[" + inner + "]"
+            i = end + 1
+        elif ch in ".*+?|(){}":
+            return None
+        else:
+            token = "[" + ch + "]" if ch in "*?[]" else ch
+            i += 1
+        repeat = re.match(r"\{(\d+)\}", body[i:])
+        if repeat:
+            parts.append(token * int(repeat.group(1)))
+            i += repeat.end()
+        else:
+            parts.append(token)
+    return "".join(parts)
+
+
+_TRIMMED = r"\b(?:no|without) (?:leading|trailing)(?: (?:or|and|/) (?:leading|trailing))? (?:white ?)?spaces?\b|\btrimmed\b"
+
+
+def _match_format(text, raw, col):
+    predicate = _format_predicate(text, raw, col)
+    if predicate is not None and _negated(text, _TRIMMED):
+        return _DECLINE
+    return predicate
+
+
+def _format_predicate(text, raw, col):
+    regex = re.search(r"\b(?:regex|regular expression|pattern)\s*:?\s*['\"`]?(\^.*\$)['\"`]?", raw, flags=re.IGNORECASE)
+    if regex:
+        glob = _regex_to_glob(regex.group(1))
+        return f"{col} NOT GLOB '{glob}'" if glob is not None else None
+    if re.search(r"\b(?:only (?:contain |have |consist of |be )?(?:digits|numbers|numeric(?: characters)?)|(?:be|is|are) (?:numeric|all digits)|digits only|numbers only)\b", text):
+        return f"{col} GLOB '*[^0-9]*' OR {col} = ''"
+    if re.search(r"\b(?:only (?:contain |have |consist of |be )?(?:letters|alphabetic(?: characters)?)|(?:be|is|are) alphabetic|letters only)\b", text):
+        return f"{col} GLOB '*[^A-Za-z]*' OR {col} = ''"
+    if re.search(r"\balphanumeric\b", text):
+        return f"{col} GLOB '*[^A-Za-z0-9]*' OR {col} = ''"
+    if re.search(r"\bupper ?case\b", text):
+        return f"{col} != UPPER({col})"
+    if re.search(r"\blower ?case\b", text):
+        return f"{col} != LOWER({col})"
+    if re.search(_TRIMMED, text):
+        return f"{col} != TRIM({col})"
+    if re.search(r"\bvalid e-?mail\b", text):
+        return f"{col} NOT LIKE '%_@_%._%'"
+    affix = re.search(r"\b(start|begin|end)s? with ['\"`]?([^'\"`\s]+)['\"`]?$", raw, flags=re.IGNORECASE)
+    if affix:
+        value = affix.group(2)
+        if affix.group(1).lower() == "end":
+            return f"SUBSTR({col}, -{len(value)}) != {_string_literal(value)}"
+        return f"SUBSTR({col}, 1, {len(value)}) != {_string_literal(value)}"
+    return None
+
+
+_NO_DUPLICATES = r"\b(?:no|without) duplicates?\b|\bnot (?:be |contain |have )?(?:any )?duplicated?s?\b"
+
+
+def _match_unique(text, raw, col, table):
+    if not re.search(rf"\b(?:unique|distinct)\b|{_NO_DUPLICATES}", text):
+        return None
+    if _negated(text, _NO_DUPLICATES):
+        return _DECLINE
+    return f"{col} IN (SELECT {col} FROM {table} WHERE {col} IS NOT NULL GROUP BY {col} HAVING COUNT(*) > 1)"
+
+
+# Compile a rule into "SELECT rowid FROM <table> WHERE <violation>", or None to use the agent
+# SQLite's affinity rules: INT wins, then CHAR, CLOB or TEXT make a text column
+def _text_affinity(declared_type):
+    declared_type = (declared_type or "").upper()
+    return "INT" not in declared_type and any(word in declared_type for word in ("CHAR", "CLOB", "TEXT"))
+
+
+# column_type is the declared type of the column; None when unknown (treated as text)
+def compile_rule(rule, table_name, column_name, columns=None, column_type=None):
+    raw = _normalize_rule(rule)
+    text = raw.lower()
+    if not text:
+        return None
+
+    # Rules about other columns need the agent
+    for other in columns or []:
+        if other.lower() != column_name.lower() and len(other) > 3 and re.search(rf"\b{re.escape(other.lower())}\b", text):
+            return None
+
+    # Several conditions in one rule need the agent too ("between x and y" and value lists excepted)
+    stripped = re.sub(rf"\bbetween {_NUMBER} and {_NUMBER}\b", "", text)
+    stripped = re.sub(r"\b(?:leading|trailing) (?:or|and) (?:leading|trailing)\b", "", stripped)
+    stripped = re.sub(r"\bthan or equal to\b", "", stripped)
+    has_listing = re.search(r"\b(?:one of|allowed values|valid values|be in|either)\b", text)
+    if not has_listing and re.search(r"\b(?:and|or|unless|except|if|when|but)\b", stripped):
+        if not re.search(rf"\b{_NULLISH} or {_NULLISH}\b", stripped):
+            return None
+
+    col = quote_identifier(column_name)
+    table = quote_identifier(table_name)
+    length, text_format = _match_length(text, raw, col), _match_format(text, raw, col)
+    if column_type is not None and not _text_affinity(column_type):
+        length = _DECLINE if length is not None else None
+        text_format = _DECLINE if text_format is not None else None
+    candidates = [
+        _match_not_null(text, raw, col),
+        length,
+        _match_range(text, raw, col),
+        _match_allowed_values(text, raw, col),
+        text_format,
+        _match_unique(text, raw, col, table),
+    ]
+    candidates = [c for c in candidates if c is not None]
+    if len(candidates) != 1 or candidates[0] is _DECLINE:
+        return None
+    return f"SELECT rowid FROM {table} WHERE {candidates[0]}"
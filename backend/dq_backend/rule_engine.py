@@ -0,0 +1,121 @@
+from bitmap import RowBitmap
+from data_access import quote_identifier, fetch_one, fetch_scalar, iter_rows
+from rule_results import save_result
+from rule_sql import extract_rule_predicate
+from utils import engine_source, get_all_rules_of_table, get_columns_of_table
+
+# ------------------------------------------ rule execution ----------------------------------------------
+
+def _rule_stats(total_rows, good_rows):
+    percentage_bad_rows = (good_rows * 100) / total_rows if total_rows else None
+    return {
+        "total_rows": total_rows,
+        "total_good_rows": good_rows,
+        "percentage_bad_rows": percentage_bad_rows,
+    }
+
+
+# Run a single rule query on its own scan, optionally collecting the row ids it returns
+def _run_rule_alone(rule, table_name, with_rows=False):
+    column = quote_identifier(rule["column_name"])
+    rule_query = rule["sql_query"].strip().rstrip(";")
+    total_rows = fetch_scalar(engine_source, f"SELECT COUNT({column}) FROM {quote_identifier(table_name)}")
+    if not with_rows:
+        good_rows = fetch_scalar(engine_source, f"SELECT COUNT(*) FROM ({rule_query})")
+        return _rule_stats(total_rows, good_rows), None
+
+    row_ids = [row[0] for row in iter_rows(engine_source, rule_query)]
+    bitmap = RowBitmap(row_id for row_id in row_ids if isinstance(row_id, int))
+    return _rule_stats(total_rows, len(row_ids)), bitmap
+
+
+# Collect the matching row ids of every fused rule with one filtered scan
+def _collect_fused_rows(table_name, predicates):
+    flags = ", ".join(f"({predicate})" for predicate in predicates)
+    condition = " OR ".join(f"({predicate})" for predicate in predicates)
+    query = f"SELECT rowid, {flags} FROM {quote_identifier(table_name)} WHERE {condition}"
+    row_ids = [[] for _ in predicates]
+    for row in iter_rows(engine_source, query):
+        for ids, flag in zip(row_ids, row[1:]):
+            if flag:
+                ids.append(row[0])
+    return [RowBitmap(ids) for ids in row_ids]
+
+
+def _save_rule_rows(rule, table_name, bitmap):
+    if bitmap is None:
+        return None
+    return save_result(bitmap, table_name, rule["column_name"], rule["rule_id"], rule["rule_category"])
+
+
+# Build one SELECT that evaluates every fusable rule in a single pass over the table
+def build_fused_query(table_name, predicates, columns):
+    select_items = ["COUNT(*)"]
+    select_items += [f"COUNT({quote_identifier(column)})" for column in columns]
+    select_items += [f"COALESCE(SUM(CASE WHEN ({predicate}) THEN 1 ELSE 0 END), 0)" for predicate in predicates]
+    return f"SELECT {', '.join(select_items)} FROM {quote_identifier(table_name)}"
+
+
+# Run all rules of a table, fusing as many as possible into one table scan.
+# With with_rows the matching row ids of every rule are kept as bitmaps (see rule_results).
+def run_rules_on_table(table_name, with_rows=False):
+    rules = get_all_rules_of_table(table_name)
+    columns_of_table = set(get_columns_of_table(table_name))
+
+    results = {}
+    fused, standalone = [], []
+    for rule in rules:
+        if rule["column_name"] not in columns_of_table:
+            # A quoted unknown name would be counted as a string literal instead of failing
+            error = f"Column '{rule['column_name']}' not found in '{table_name}'."
+            results[rule["rule_id"]] = {**_rule_stats(None, None), "rows_handle": None, "fused": False, "error": error}
+            continue
+        predicate = extract_rule_predicate(rule["sql_query"] or "", table_name)
+        if predicate is None:
+            standalone.append(rule)
+        else:
+            fused.append((rule, predicate))
+
+    total_rows = None
+    scans = 0
+
+    if fused:
+        columns = list(dict.fromkeys(rule["column_name"] for rule, _ in fused))
+        query = build_fused_query(table_name, [predicate for _, predicate in fused], columns)
+        try:
+            row = fetch_one(engine_source, query)
+            scans += 1
+        except Exception:
+            # One bad predicate breaks the whole fused statement, so run them one by one instead
+            standalone.extend(rule for rule, _ in fused)
+            fused = []
+        else:
+            total_rows = row[0]
+            non_null = dict(zip(columns, row[1:1 + len(columns)]))
+            if with_rows:
+                bitmaps = _collect_fused_rows(table_name, [predicate for _, predicate in fused])
+                scans += 1
+            else:
+                bitmaps = [None] * len(fused)
+            for (rule, _), good_rows, bitmap in zip(fused, row[1 + len(columns):], bitmaps):
+                stats = _rule_stats(non_null[rule["column_name"]], good_rows)
+                rows_handle = _save_rule_rows(rule, table_name, bitmap)
+                results[rule["rule_id"]] = {**stats, "rows_handle": rows_handle, "fused": True, "error": None}
+
+    for rule in standalone:
+        try:
+            stats, bitmap = _run_rule_alone(rule, table_name, with_rows)
+            error = None
+        except Exception as e:
+            stats, bitmap = _rule_stats(None, None), None
+            error = str(e)
+        scans += 1
+        rows_handle = _save_rule_rows(rule, table_name, bitmap)
+        results[rule["rule_id"]] = {**stats, "rows_handle": rows_handle, "fused": False, "error": error}
+
+    return {
+        "table_name": table_name,
+        "total_rows": total_rows,
+        "scans": scans,
+        "rules": [{**rule, **results[rule["rule_id"]]} for rule in rules],
+    }
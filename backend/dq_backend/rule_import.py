@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from utils import aconvert_rule_to_sql, get_columns_of_table, get_schema_of_table, validate_rule_query, unknown_identifiers, rule_repository
+from rule_repository import RULE_CATEGORIES, RULE_FIELDS
+from rule_sql import normalize_rule_query
+from concurrency import ai_limiter, LimitExceeded
+
+# ------------------------------------------ bulk rule import / export ----------------------------------------------
+# Loads a whole rules file (JSON or YAML) at once. The schema of every table in the file is
+# fetched once up front, so the conversions hit the catalog cache; rules without a sql_query
+# are converted with at most RULE_IMPORT_CONCURRENCY in flight, every query is checked
+# against the source database, and the rules are written in a single transaction.
+# The export streams the same document shape back, so an export can be re-imported as is.
+
+RULE_IMPORT_CONCURRENCY = int(os.getenv("RULE_IMPORT_CONCURRENCY", "8"))
+
+_REQUIRED_FIELDS = ("rule", "table_name", "column_name", "rule_category")
+
+
+class RuleImportError(ValueError):
+    pass
+
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise RuleImportError("YAML rule files need PyYAML (pip install pyyaml).")
+    return yaml
+
+
+# Parse a rules document: a list of rules or {"rules": [...]}; fmt is "json" or "yaml"
+def parse_rules_document(content, fmt="json"):
+    if isinstance(content, bytes):
+        content = content.decode("utf-8")
+    try:
+        document = json.loads(content) if fmt == "json" else _yaml().safe_load(content)
+    except RuleImportError:
+        raise
+    except Exception as e:
+        raise RuleImportError(f"Could not parse the rules file as {fmt}: {e}") from e
+
+    if isinstance(document, dict):
+        document = document.get("rules")
+    if not isinstance(document, list):
+        raise RuleImportError('Expected a list of rules or an object with a "rules" list.')
+
+    rules = []
+    for index, item in enumerate(document):
+        if not isinstance(item, dict):
+            raise RuleImportError(f"Rule #{index} is not an object.")
+        missing = [field for field in _REQUIRED_FIELDS if not item.get(field)]
+        if missing:
+            raise RuleImportError(f"Rule #{index} is missing {', '.join(missing)}.")
+        if item["rule_category"] not in RULE_CATEGORIES:
+            raise RuleImportError(f"Rule #{index} has invalid rule_category '{item['rule_category']}', expected one of {', '.join(RULE_CATEGORIES)}.")
+        rule = {field: item.get(field) for field in RULE_FIELDS}
+        rule["rule_id"] = str(rule["rule_id"] or uuid.uuid4())
+        rules.append(rule)
+    return rules
+
+
+# Columns of every table referenced by the rules; also warms the schema cache for the conversions
+def _prepare_tables(table_names):
+    columns = {}
+    for table_name in table_names:
+        columns[table_name] = get_columns_of_table(table_name)
+        if columns[table_name]:
+            get_schema_of_table(table_name)
+    return columns
+
+
+# (query, None) when the query runs and names only columns of the table, else (None, error)
+def _check_query(sql_query, table_name, columns):
+    sql_query = normalize_rule_query(sql_query, table_name)
+    unknown = unknown_identifiers(sql_query, table_name, columns)
+    if unknown:
+        return None, f"Query refers to {', '.join(unknown)}, which is not a column of '{table_name}': {sql_query}"
+    if not validate_rule_query(sql_query):
+        return None, f"Query does not run against '{table_name}': {sql_query}"
+    return sql_query, None
+
+
+async def _convert_rule(index, rule, columns, use_cache, semaphore):
+    table_name, column_name = rule["table_name"], rule["column_name"]
+    failed = {"index": index, "rule_id": rule["rule_id"], "rule": rule["rule"]}
+    if not columns.get(table_name):
+        return {**failed, "error": f"Table '{table_name}' not found."}
+    if column_name not in columns[table_name]:
+        return {**failed, "error": f"Column '{column_name}' not found in '{table_name}'."}
+
+    path = "provided"
+    sql_query = rule["sql_query"]
+    if not sql_query:
+        async with semaphore:
+            try:
+                async with ai_limiter:
+                    query_ready, output, path = await aconvert_rule_to_sql(rule["rule"], table_name, column_name, use_cache)
+            except LimitExceeded as e:
+                return {**failed, "error": str(e)}
+            except Exception as e:
+                return {**failed, "error": f"{type(e).__name__}: {e}"}
+        if not query_ready:
+            return {**failed, "error": f"The rule needs clarification: {output}"}
+        sql_query = output
+
+    checked, error = await asyncio.to_thread(_check_query, sql_query, table_name, columns[table_name])
+    if error:
+        return {**failed, "error": error}
+    return {"index": index, "rule": {**rule, "sql_query": checked}, "path": path}
+
+
+# Convert, validate and store the rules. Nothing is written when a rule fails unless
+# skip_invalid is set; replace overwrites rules whose rule_id already exists.
+async def aimport_rules(rules, use_cache=True, replace=False, skip_invalid=False, max_concurrency=RULE_IMPORT_CONCURRENCY):
+    started = time.perf_counter()
+    columns = await asyncio.to_thread(_prepare_tables, sorted({rule["table_name"] for rule in rules}))
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    results = await asyncio.gather(*(
+        _convert_rule(index, rule, columns, use_cache, semaphore) for index, rule in enumerate(rules)
+    ))
+
+    errors = [result for result in results if "error" in result]
+    converted = [result for result in results if "error" not in result]
+    paths = {}
+    for result in converted:
+        paths[result["path"]] = paths.get(result["path"], 0) + 1
+
+    rule_ids = []
+    if converted and (skip_invalid or not errors):
+        rule_ids = await asyncio.to_thread(rule_repository.insert_rules, [result["rule"] for result in converted], replace)
+
+    return {
+        "imported": len(rule_ids),
+        "rule_ids": rule_ids,
+        "errors": errors,
+        "paths": paths,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _iter_json(rules):
+    yield '{"rules": ['
+    separator = "\n"
+    for rule in rules:
+        yield separator + json.dumps(rule)
+        separator = ",\n"
+    yield "\n]}\n"
+
+
+def _iter_yaml(rules, yaml):
+    yield "rules:"
+    empty = True
+    for rule in rules:
+        if empty:
+            yield "\n"
+            empty = False
+        yield yaml.safe_dump([rule], sort_keys=False, allow_unicode=True)
+    if empty:
+        yield " []\n"
+
+
+# Stream the stored rules as a document parse_rules_document reads back. Checks the format
+# before returning, so a missing PyYAML surfaces as an error rather than a broken stream
+def export_rules(table_name=None, fmt="json"):
+    if fmt == "yaml":
+        return _iter_yaml(rule_repository.iter_rules(table_name), _yaml())
+    return _iter_json(rule_repository.iter_rules(table_name))
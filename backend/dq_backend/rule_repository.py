@@ -0,0 +1,123 @@
+import sqlite3
+from data_access import execute, fetch_all, fetch_column, iter_dicts, transaction
+from rule_sql import normalize_rule_query
+
+# ------------------------------------------ rule repository ----------------------------------------------
+# All access to rule_storage. Lookups by table and by table + column use a composite
+# index instead of scanning the table, every statement is a constant parameterized SQL
+# text (so sqlite3 reuses the prepared statement and quotes in rule text are harmless),
+# and bulk operations run as one transaction: all rows are written or none.
+
+RULE_FIELDS = ("rule_id", "rule", "table_name", "column_name", "rule_category", "sql_query")
+RULE_CATEGORIES = ("info", "error", "warning")
+
+_SELECT_RULES = "SELECT rule_id, rule, table_name, column_name, rule_category, sql_query FROM rule_storage"
+_INSERT_RULE = (
+    "INSERT INTO rule_storage (rule_id, rule, table_name, column_name, rule_category, sql_query) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+_REPLACE_RULE = _INSERT_RULE.replace("INSERT INTO", "INSERT OR REPLACE INTO")
+_UPDATE_RULE = (
+    "UPDATE rule_storage SET rule = COALESCE(?, rule), rule_category = COALESCE(?, rule_category), "
+    "sql_query = COALESCE(?, sql_query) WHERE rule_id = ?"
+)
+_DELETE_RULE = "DELETE FROM rule_storage WHERE rule_id = ?"
+
+
+class RuleRepository:
+    def __init__(self, engine):
+        self.engine = engine
+        self._ready = False
+
+    def _ensure_storage(self):
+        if self._ready:
+            return
+        execute(self.engine, """
+            CREATE TABLE IF NOT EXISTS rule_storage (
+                rule_id TEXT PRIMARY KEY,
+                rule TEXT,
+                table_name TEXT,
+                column_name TEXT,
+                rule_category TEXT CHECK(rule_category IN ('info', 'error', 'warning')),
+                sql_query TEXT
+            )
+        """)
+        # Serves both "rules of a table" (leftmost column) and "rules of a column"
+        execute(self.engine, "CREATE INDEX IF NOT EXISTS ix_rule_storage_table_column ON rule_storage (table_name, column_name)")
+        self._ready = True
+
+    @staticmethod
+    def _check_category(rule_category):
+        if rule_category is not None and rule_category not in RULE_CATEGORIES:
+            raise ValueError(f"Invalid rule_category '{rule_category}', expected one of {', '.join(RULE_CATEGORIES)}.")
+
+    def list_rules(self, table_name):
+        self._ensure_storage()
+        return list(iter_dicts(self.engine, _SELECT_RULES + " WHERE table_name = ?", (table_name,)))
+
+    def rules_on_column(self, table_name, column_name):
+        self._ensure_storage()
+        return fetch_column(self.engine, "SELECT rule FROM rule_storage WHERE table_name = ? AND column_name = ?", (table_name, column_name))
+
+    # Stream rules (of one table, or all of them) without loading them into memory at once
+    def iter_rules(self, table_name=None):
+        self._ensure_storage()
+        if table_name is None:
+            return iter_dicts(self.engine, _SELECT_RULES + " ORDER BY table_name, column_name")
+        return iter_dicts(self.engine, _SELECT_RULES + " WHERE table_name = ? ORDER BY column_name", (table_name,))
+
+    # rules: dicts with all RULE_FIELDS; queries are stored in the rowid form.
+    # With replace=True rules whose rule_id already exists are overwritten instead of failing the batch
+    def insert_rules(self, rules, replace=False):
+        self._ensure_storage()
+        rows = []
+        for rule in rules:
+            self._check_category(rule["rule_category"])
+            rows.append((
+                rule["rule_id"], rule["rule"], rule["table_name"], rule["column_name"], rule["rule_category"],
+                normalize_rule_query(rule["sql_query"], rule["table_name"]),
+            ))
+        try:
+            with transaction(self.engine) as cur:
+                cur.executemany(_REPLACE_RULE if replace else _INSERT_RULE, rows)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Rules not inserted: {e}") from e
+        return [row[0] for row in rows]
+
+    # updates: dicts with rule_id and any of rule, rule_category, sql_query; returns the number of rules changed
+    def update_rules(self, updates):
+        self._ensure_storage()
+        for update in updates:
+            self._check_category(update.get("rule_category"))
+        with transaction(self.engine) as cur:
+            changed = 0
+            for update in updates:
+                sql_query = update.get("sql_query")
+                if sql_query is not None:
+                    cur.execute("SELECT table_name FROM rule_storage WHERE rule_id = ?", (update["rule_id"],))
+                    row = cur.fetchone()
+                    if row is None:
+                        continue
+                    sql_query = normalize_rule_query(sql_query, row[0])
+                cur.execute(_UPDATE_RULE, (update.get("rule"), update.get("rule_category"), sql_query, update["rule_id"]))
+                changed += cur.rowcount
+        return changed
+
+    def delete_rules(self, rule_ids):
+        self._ensure_storage()
+        with transaction(self.engine) as cur:
+            cur.executemany(_DELETE_RULE, [(rule_id,) for rule_id in rule_ids])
+            return cur.rowcount
+
+    # Rewrite stored rule queries into the rowid form, returns the number of rules changed
+    def normalize_queries(self):
+        self._ensure_storage()
+        updates = []
+        for rule_id, table_name, sql_query in fetch_all(self.engine, "SELECT rule_id, table_name, sql_query FROM rule_storage"):
+            normalized = normalize_rule_query(sql_query or "", table_name or "")
+            if sql_query and normalized != sql_query:
+                updates.append((normalized, rule_id))
+        if updates:
+            with transaction(self.engine) as cur:
+                cur.executemany("UPDATE rule_storage SET sql_query = ? WHERE rule_id = ?", updates)
+        return len(updates)
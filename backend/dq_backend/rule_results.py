@@ -0,0 +1,97 @@
+import threading
+import uuid
+from collections import OrderedDict
+from bitmap import RowBitmap
+
+# ------------------------------------------ rule result store ----------------------------------------------
+# Keeps the row bitmaps produced by rule queries in memory, behind opaque handles,
+# so clients can page through matching rows instead of receiving the whole list.
+# The latest bitmap of every stored rule is also indexed per table, which lets us
+# combine rules (e.g. rows failing any error rule) without running SQL again.
+
+MAX_RESULTS = 256
+
+_results = OrderedDict()
+_latest_rule_results = {}
+_lock = threading.Lock()
+
+
+# Store a bitmap and return its handle
+def save_result(bitmap, table_name, column_name=None, rule_id=None, rule_category=None):
+    handle = uuid.uuid4().hex
+    entry = {
+        "bitmap": bitmap,
+        "table_name": table_name,
+        "column_name": column_name,
+        "rule_id": rule_id,
+        "rule_category": rule_category,
+    }
+    with _lock:
+        _results[handle] = entry
+        if rule_id is not None:
+            previous = _latest_rule_results.get((table_name, rule_id))
+            if previous is not None:
+                _results.pop(previous, None)
+            _latest_rule_results[(table_name, rule_id)] = handle
+        while len(_results) > MAX_RESULTS:
+            old_handle, old_entry = _results.popitem(last=False)
+            if old_entry["rule_id"] is not None:
+                _latest_rule_results.pop((old_entry["table_name"], old_entry["rule_id"]), None)
+    return handle
+
+
+def get_result(handle):
+    with _lock:
+        entry = _results.get(handle)
+        if entry is not None:
+            _results.move_to_end(handle)
+        return entry
+
+
+# Get one page of row ids of a stored result
+def page_result(handle, offset, limit):
+    entry = get_result(handle)
+    if entry is None:
+        return None
+    bitmap = entry["bitmap"]
+    return {
+        "handle": handle,
+        "total": len(bitmap),
+        "offset": offset,
+        "rows": bitmap.slice(offset, limit),
+    }
+
+
+# Combine stored results with AND / OR / ANDNOT (left to right), returns the new handle
+def combine_results(handles, op):
+    entries = [get_result(handle) for handle in handles]
+    if not entries or any(entry is None for entry in entries):
+        return None
+    bitmap = entries[0]["bitmap"]
+    for entry in entries[1:]:
+        if op == "and":
+            bitmap = bitmap & entry["bitmap"]
+        elif op == "or":
+            bitmap = bitmap | entry["bitmap"]
+        elif op == "andnot":
+            bitmap = bitmap - entry["bitmap"]
+        else:
+            raise ValueError(f"Unknown bitmap operation '{op}'")
+    return save_result(bitmap, entries[0]["table_name"])
+
+
+# Union of the latest stored results of a table's rules, optionally for one rule category
+def rows_matching_any_rule(table_name, rule_category=None):
+    with _lock:
+        entries = [
+            _results[handle]
+            for (table, _), handle in _latest_rule_results.items()
+            if table == table_name and handle in _results
+        ]
+    entries = [e for e in entries if rule_category is None or e["rule_category"] == rule_category]
+    if not entries:
+        return None
+    bitmap = RowBitmap()
+    for entry in entries:
+        bitmap = bitmap | entry["bitmap"]
+    return save_result(bitmap, table_name)
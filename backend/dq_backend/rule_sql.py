@@ -0,0 +1,116 @@
+import re
+from data_access import quote_identifier
+
+# ------------------------------------------ rule sql parsing ----------------------------------------------
+
+# Clause keywords we care about when splitting a rule query at the top level
+_CLAUSE_RE = re.compile(
+    r"(FROM|WHERE|GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|UNION|INTERSECT|EXCEPT|JOIN|WINDOW)\b",
+    re.IGNORECASE,
+)
+_AGGREGATE_RE = re.compile(r"\b(COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(", re.IGNORECASE)
+_NOT_FUSABLE = {"GROUP BY", "HAVING", "LIMIT", "UNION", "INTERSECT", "EXCEPT", "JOIN", "WINDOW"}
+
+
+def _unquote_identifier(name):
+    name = name.strip()
+    if len(name) >= 2 and name[0] + name[-1] in ('""', "``", "[]"):
+        return name[1:-1]
+    return name
+
+
+# Find clause keywords that are outside of quotes and parentheses
+def _top_level_clauses(sql):
+    clauses = []
+    depth = 0
+    quote = None
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == "[":
+            quote = "]"
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+            match = _CLAUSE_RE.match(sql, i)
+            if match:
+                keyword = " ".join(match.group(1).upper().split())
+                clauses.append((keyword, match.start(), match.end()))
+                i = match.end()
+                continue
+        i += 1
+    return clauses
+
+
+# Double-quoted names in a query, outside string literals. SQLite reads a double-quoted name
+# that matches no column as a string literal, so these are what EXPLAIN can't catch
+def quoted_identifiers(sql):
+    names = []
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch in "'\"":
+            end = i + 1
+            while end < len(sql):
+                if sql[end] == ch:
+                    if sql[end + 1:end + 2] != ch:
+                        break
+                    end += 1
+                end += 1
+            if ch == '"':
+                names.append(sql[i + 1:end].replace('""', '"'))
+            i = end + 1
+            continue
+        i += 1
+    return names
+
+
+# Get the row predicate of a rule query, or None if the query can't be fused into a single scan
+def extract_rule_predicate(sql, table_name):
+    sql = sql.strip().rstrip(";").strip()
+    if not sql[:6].upper() == "SELECT":
+        return None
+
+    clauses = _top_level_clauses(sql)
+    keywords = [c[0] for c in clauses]
+    if keywords.count("FROM") != 1 or _NOT_FUSABLE.intersection(keywords):
+        return None
+
+    select_list = sql[6:clauses[0][1]] if clauses else ""
+    if _AGGREGATE_RE.search(select_list) or select_list.strip().upper().startswith("DISTINCT"):
+        return None
+
+    bounds = {kw: (start, end) for kw, start, end in clauses}
+    ends = sorted(start for _, start, _ in clauses) + [len(sql)]
+
+    def clause_body(keyword):
+        start, end = bounds[keyword]
+        next_start = next(pos for pos in ends if pos > start)
+        return sql[end:next_start].strip()
+
+    from_target = clause_body("FROM")
+    if _unquote_identifier(from_target).lower() != table_name.lower():
+        return None
+
+    if "WHERE" not in bounds:
+        return "1"
+    return clause_body("WHERE") or None
+
+
+# Rewrite a rule query into "SELECT rowid FROM <table> WHERE <predicate>", so it returns the
+# real (indexed) ids of matching rows. Queries we can't parse are returned unchanged.
+def normalize_rule_query(sql, table_name):
+    predicate = extract_rule_predicate(sql, table_name)
+    if predicate is None:
+        return sql
+    query = f"SELECT rowid FROM {quote_identifier(table_name)}"
+    if predicate != "1":
+        query += f" WHERE {predicate}"
+    return query
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+# ------------------------------------------ single flight ----------------------------------------------
+# Coalesces identical in-flight calls: the first caller for a key runs the computation and
+# every caller that arrives while it is running waits for and shares that same result
+# (or exception). Nothing is kept once the call finishes - that is the LLM cache's job.
+# Counters per kind: calls, leaders (computations actually run) and coalesced (calls that
+# piggybacked on one already in flight).
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self._waiters = {}
+        self._stats = {}
+
+    def _count(self, kind, outcome):
+        counters = self._stats.setdefault(kind, {"calls": 0, "leaders": 0, "coalesced": 0})
+        counters["calls"] += 1
+        counters[outcome] += 1
+
+    # Blocking version, for worker threads (precompute, sync callers)
+    def do(self, kind, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(kind, "leaders" if leader else "coalesced")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    # Async version; the work runs as its own task so a cancelled caller doesn't cancel it for the
+    # others. When the last caller waiting on it is cancelled nobody wants the result any more,
+    # so the work is cancelled too (and forgotten at once, so a new caller starts it afresh)
+    async def ado(self, kind, key, coro_fn, *args):
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[task_key] = loop.create_task(coro_fn(*args))
+                task.add_done_callback(lambda done: self._forget(task_key, done))
+            self._waiters[task_key] = self._waiters.get(task_key, 0) + 1
+            self._count(kind, "leaders" if leader else "coalesced")
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            with self._lock:
+                abandoned = self._waiters.get(task_key) == 1 and not task.done()
+                if abandoned:
+                    self._forget_locked(task_key, task)
+            if abandoned:
+                task.cancel()
+            raise
+        finally:
+            with self._lock:
+                if self._waiters.get(task_key, 0) > 1:
+                    self._waiters[task_key] -= 1
+                else:
+                    self._waiters.pop(task_key, None)
+
+    def _forget(self, task_key, task):
+        with self._lock:
+            self._forget_locked(task_key, task)
+
+    # Only drops the entry if it is still this task; a cancelled one may already have been replaced
+    def _forget_locked(self, task_key, task):
+        if self._tasks.get(task_key) is task:
+            del self._tasks[task_key]
+
+    def stats(self):
+        with self._lock:
+            stats = {kind: dict(counters) for kind, counters in self._stats.items()}
+            in_flight = len(self._calls) + len(self._tasks)
+        for counters in stats.values():
+            counters["coalesced_ratio"] = counters["coalesced"] / counters["calls"] if counters["calls"] else None
+        return {"kinds": stats, "in_flight": in_flight}
+
+
+single_flight = SingleFlight()
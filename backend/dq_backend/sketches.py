@@ -0,0 +1,67 @@
+import heapq
+import itertools
+
+# ------------------------------------------ streaming sketches ----------------------------------------------
+# Small summaries used by the column profiler. Each one sees every value once and keeps
+# bounded memory regardless of the table size.
+
+
+class SpaceSaving:
+    """Approximate top-k heavy hitters. Counts may overestimate by at most the reported error."""
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._heap = []
+        self._order = itertools.count()
+
+    # Counting a tracked value is one dict update; the heap is only touched on eviction,
+    # and holds one entry per tracked value whose count may lag behind the live one
+    def add(self, value, weight=1):
+        counts = self.counts
+        if value in counts:
+            counts[value] += weight
+            return
+        if len(counts) < self.capacity:
+            counts[value] = weight
+            self.errors[value] = 0
+        else:
+            victim, floor = self._pop_min()
+            del counts[victim]
+            del self.errors[victim]
+            counts[value] = floor + weight
+            self.errors[value] = floor
+        heapq.heappush(self._heap, (counts[value], next(self._order), value))
+
+    def _pop_min(self):
+        # A stale entry goes back in with its live count, until the smallest one is current
+        while True:
+            count, _, value = heapq.heappop(self._heap)
+            live = self.counts[value]
+            if live == count:
+                return value, count
+            heapq.heappush(self._heap, (live, next(self._order), value))
+
+    def top(self, k=None):
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return [(value, count, self.errors[value]) for value, count in items[:k or self.capacity]]
+
+
+_ASCII_SHAPES = str.maketrans(
+    "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz",
+    "9" * 10 + "A" * 26 + "a" * 26,
+)
+
+
+# Shape of a string: digits become 9, letters A/a, everything else is kept
+def pattern_class(text, max_length=24):
+    head = text[:max_length]
+    if head.isascii():
+        shape = head.translate(_ASCII_SHAPES)
+    else:
+        shape = "".join(
+            "9" if ch.isdigit() else ("A" if ch.isupper() else "a") if ch.isalpha() else ch
+            for ch in head
+        )
+    return shape + "…" if len(text) > max_length else shape
@@ -0,0 +1,86 @@
+import re
+import threading
+from collections import OrderedDict
+from langchain_core.tools import StructuredTool
+
+# ------------------------------------------ sql tool cache ----------------------------------------------
+# Memoizes the SQLDatabaseToolkit tools used by the know-all agent. The same exploratory
+# queries (distinct counts, null percentages, schema lookups) come up again and again
+# across turns and sessions; results are keyed by tool, normalized input and the database
+# version, so any write or DDL makes older entries unreachable. LRU-bounded in memory.
+
+TOOL_CACHE_MAX_ENTRIES = 512
+TOOL_CACHE_MAX_RESULT_CHARS = 100_000
+
+
+def normalize_sql(sql):
+    return re.sub(r"\s+", " ", (sql or "").strip()).rstrip("; ")
+
+
+def _normalize_input(tool_name, kwargs):
+    if tool_name == "sql_db_schema":
+        return ",".join(sorted(name.strip() for name in kwargs.get("table_names", "").split(",") if name.strip()))
+    if "query" in kwargs:
+        return normalize_sql(kwargs["query"])
+    return ""
+
+
+class ToolResultCache:
+    def __init__(self, max_entries=TOOL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, tool_name, outcome):
+        counters = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, tool_name, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._count(tool_name, "hits")
+                return self._entries[key]
+            self._count(tool_name, "misses")
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {name: dict(counters) for name, counters in self._stats.items()}
+            entries = len(self._entries)
+        for counters in stats.values():
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_ratio"] = counters["hits"] / lookups if lookups else None
+        return {"tools": stats, "entries": entries, "max_entries": self.max_entries}
+
+
+# Same name, description and arguments as the wrapped tool, so the agent sees no difference
+def cached_tool(tool, cache, version):
+    def run(**kwargs):
+        key = (tool.name, _normalize_input(tool.name, kwargs), version())
+        result = cache.get(tool.name, key)
+        if result is not None:
+            return result
+        result = tool.invoke(kwargs)
+        # Errors are usually a bad query the agent will fix, no point keeping them
+        if isinstance(result, str) and not result.startswith("Error") and len(result) <= TOOL_CACHE_MAX_RESULT_CHARS:
+            cache.put(key, result)
+        return result
+
+    return StructuredTool.from_function(func=run, name=tool.name, description=tool.description, args_schema=tool.args_schema)
+
+
+def cached_tools(tools, cache, version):
+    return [cached_tool(tool, cache, version) for tool in tools]
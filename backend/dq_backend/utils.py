@@ -1,75 +1,107 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.utilities.sql_database import SQLDatabase
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-import ast
 from sqlalchemy.engine import Engine
-from sqlalchemy.pool import StaticPool
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, START, MessagesState, StateGraph
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, RemoveMessage
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from typing import TypedDict, Annotated, Literal
 from sqlalchemy import text
 from sqlalchemy import text
-from prompts import suggest_rule_prompt, generate_query_system_prompt, check_query_system_prompt, col_know_all_prompt_with_rules
+from data_access import quote_identifier, fetch_all, fetch_scalar, iter_rows
+from bitmap import RowBitmap
+from rule_results import save_result
+from rule_sql import normalize_rule_query, quoted_identifiers
+from profiling import get_table_profile, format_column_profile, describe_top_values
+from catalog import Catalog
+from registry import get_shared, prompt_version
+from llm_cache import LLMCache, normalize_whitespace, hash_text
+from singleflight import single_flight
+from chat_sessions import ChatCheckpointer
+from tool_cache import ToolResultCache, cached_tools
+from metrics import timed_stage
+from instrumentation import LLMMetricsHandler, instrument_engine, node_metrics
+from llm_providers import LLM_PROVIDER, create_llm
+from connections import read_only_engine, read_write_engine
+from rule_repository import RuleRepository
+from chat_history import estimate_tokens, fit_to_budget, messages_to_summarize, transcript
+from rule_compiler import compile_rule
+from prompts import suggest_rule_prompt, generate_query_system_prompt, check_query_system_prompt, col_know_all_prompt_with_rules, summarize_chat_prompt
 
 import os
+import base64
+import asyncio
+import time
 
 # ------------------------------------------ setup ----------------------------------------------
 
-checkpointer = MemorySaver()
 load_dotenv()
 
-# Paths
+# Paths (DQ_DB_PATH_SOURCE / DQ_RULES_DATA_PATH override them, e.g. for benchmarks)
 DATA_BASE_PATH_SOURCE = r"C:\Users\OnkarPatil\Desktop\genai_data_quality\project\data\source_data"
-DB_PATH_SOURCE = os.path.join(DATA_BASE_PATH_SOURCE, "conventional_power_plants", "conventional_power_plants.sqlite")
+DB_PATH_SOURCE = os.getenv("DQ_DB_PATH_SOURCE", os.path.join(DATA_BASE_PATH_SOURCE, "conventional_power_plants", "conventional_power_plants.sqlite"))
 
-DATA_BASE_PATH_RULES = r"C:\Users\OnkarPatil\Desktop\genai_data_quality\project\data\rules"
+DATA_BASE_PATH_RULES = os.getenv("DQ_RULES_DATA_PATH", r"C:\Users\OnkarPatil\Desktop\genai_data_quality\project\data\rules")
 DB_PATH_RULES = os.path.join(DATA_BASE_PATH_RULES, "rule_management.sqlite")
+DB_PATH_LLM_CACHE = os.path.join(DATA_BASE_PATH_RULES, "llm_cache.sqlite")
+DB_PATH_CHAT = os.path.join(DATA_BASE_PATH_RULES, "chat_sessions.sqlite")
 
-# Load database
-def load_database(db_path=DATA_BASE_PATH_SOURCE) -> Engine:
+LLM_MODEL = "gemini-2.5-flash"
+RULE_TO_SQL_PROMPT_VERSION = prompt_version(generate_query_system_prompt, check_query_system_prompt)
+SUGGEST_RULE_PROMPT_VERSION = prompt_version(suggest_rule_prompt)
+
+# Load database (one shared engine per path, pooled WAL connections, see connections.py)
+def load_database(db_path=DB_PATH_SOURCE) -> Engine:
     """Engine for opsd data."""
-    return create_engine(f"sqlite:///{db_path}", poolclass=StaticPool)
+    return get_shared(("engine", db_path), lambda: instrument_engine(read_write_engine(db_path)))
+
+# Load database read-only (one shared engine per path) - source data is only ever read
+def load_read_only_database(db_path=DB_PATH_SOURCE) -> Engine:
+    return get_shared(("engine_ro", db_path), lambda: instrument_engine(read_only_engine(db_path)))
 
-# Get llm
-def get_llm():
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
-    return llm
+# Get llm (one shared client per model; LLM_PROVIDER picks gemini or the local fake, see llm_providers.py)
+def get_llm(model=LLM_MODEL):
+    return get_shared(("llm", LLM_PROVIDER, model), lambda: create_llm(model, callbacks=[LLMMetricsHandler(model)]))
 
-# Get db
+# Get db (one shared wrapper per path; the source data is wrapped read-only, so agent tools can't change it)
 def get_db(db_path):
-    engine = create_engine(f"sqlite:///{db_path}", poolclass=StaticPool)
-    db = SQLDatabase(engine)
-    return db
+    engine = load_read_only_database(db_path) if db_path == DB_PATH_SOURCE else load_database(db_path)
+    return get_shared(("db", db_path), lambda: SQLDatabase(engine))
 
-llm = get_llm()
+engine_source = load_read_only_database(DB_PATH_SOURCE)
+engine_rules = load_database(DB_PATH_RULES)
 db_source = get_db(DB_PATH_SOURCE)
 db_rules = get_db(DB_PATH_RULES)
+catalog_source = Catalog(engine_source, db_path=DB_PATH_SOURCE)
+tool_cache = ToolResultCache()
+llm_cache = LLMCache(load_database(DB_PATH_LLM_CACHE))
+rule_repository = RuleRepository(engine_rules)
+# Chat history, one thread per session (see chat_sessions.py)
+checkpointer = ChatCheckpointer.from_path(DB_PATH_CHAT)
 
 # --------------------------------------- general utils ----------------------------------------------
 
-# Get schema of a table
-def get_schema_of_table(table, db, llm):
+# Get schema of a table (cached, see catalog.py)
+@timed_stage("get_schema_of_table")
+def get_schema_of_table(table):
+    return catalog_source.schema_text(table)
 
-    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-    tools = toolkit.get_tools()
-    tools = tools
-    
-    get_schema_tool = next(tool for tool in tools if tool.name == "sql_db_schema")
-    schema_call = {
-    "name": "sql_db_schema",
-    "args": {"table_names": table.strip()},
-    "id": f"schema_{table.strip()}",
-    "type": "tool_call",
-    }
-    schema_message = get_schema_tool.invoke(schema_call)
-    schema = schema_message.content
-    return schema
+# Get column names of a table (cached)
+def get_columns_of_table(table_name):
+    return catalog_source.column_names(table_name)
+
+# SQLite reads a double-quoted name that isn't a column as a string literal, so names
+# are checked against the catalog before they are quoted into a query
+def require_column(table_name, column_name):
+    columns = get_columns_of_table(table_name)
+    if not columns:
+        raise LookupError(f"Table '{table_name}' not found.")
+    if column_name not in columns:
+        raise LookupError(f"Column '{column_name}' not found in '{table_name}'.")
 
 # Delete a table
 def delete_table(table_name: str):
@@ -87,60 +119,76 @@ def get_sql_tools(db,llm):
     tools = tools
     return tools
 
+# Precomputed column statistics as a tool, one call instead of several exploratory queries
+def column_profile(table_name: str, column_name: str) -> str:
+    """Precomputed statistics of one column: row/null/empty counts, distinct estimate, min/max/mean, value lengths, patterns and top values."""
+    profile = get_profile_of_table(table_name)
+    if profile is None:
+        return f"Error: table '{table_name}' not found."
+    return format_column_profile(profile, column_name)
+
+# SQL tools of the know-all agent, memoized per database version (see tool_cache.py), plus column_profile
+def get_chat_tools(db, llm):
+    tools = cached_tools(get_sql_tools(db, llm), tool_cache, catalog_source.version)
+    return tools + [StructuredTool.from_function(column_profile)]
+
 # Get tables from database
-def list_tables(db,llm):
-    tool_call = {
-    "name": "sql_db_list_tables",
-    "args": {},
-    "id": "abc123",
-    "type": "tool_call",
-    }
-    tools = get_sql_tools(db,llm)
-    list_tables_tool = next(tool for tool in tools if tool.name == "sql_db_list_tables")
-    tool_message = list_tables_tool.invoke(tool_call)
-    return tool_message.content
+def list_tables():
+    return ", ".join(catalog_source.list_tables())
 
 # Get stats for query testing/validation on a column
+@timed_stage("get_query_test_results")
 def get_query_test_results(query: str, column_name, table_name):
-    results = db_source.run(query)
-    results = ast.literal_eval(results)
-    list_good_rows = [row[0] for row in results]
-    
-    query_to_get_total_rows = f"SELECT COUNT({column_name}) AS row_count FROM {table_name};"
-    result = db_source.run(query_to_get_total_rows)
-    if result:
-        result = ast.literal_eval(result)
-        total_rows = result[0][0]
-        percentage_bad_rows = (len(list_good_rows)*100)/total_rows
+    require_column(table_name, column_name)
+    query = normalize_rule_query(query, table_name)
+    total_good_rows = 0
+
+    def row_ids():
+        nonlocal total_good_rows
+        for row in iter_rows(engine_source, query):
+            total_good_rows += 1
+            if isinstance(row[0], int):
+                yield row[0]
+
+    good_rows = RowBitmap(row_ids())
+    rows_handle = save_result(good_rows, table_name, column_name)
+
+    query_to_get_total_rows = f"SELECT COUNT({quote_identifier(column_name)}) AS row_count FROM {quote_identifier(table_name)}"
+    total_rows = fetch_scalar(engine_source, query_to_get_total_rows)
+    if total_rows:
+        percentage_bad_rows = (total_good_rows*100)/total_rows
     else:
-        total_rows = None
         percentage_bad_rows = None
 
     return {
         "total_rows":total_rows,
-        "total_good_rows":len(list_good_rows),
+        "total_good_rows":total_good_rows,
         "percentage_bad_rows":percentage_bad_rows,
-        "list_good_rows":list_good_rows,
+        "rows_handle":rows_handle,
     }
 
 # Run query
-def run_query(query: str, db_path=DATA_BASE_PATH_SOURCE):
-    engine = load_database(db_path)
+def run_query(query: str, db_path=DB_PATH_SOURCE):
+    engine = load_read_only_database(db_path)
     with engine.connect() as conn:
         result = conn.execute(text(query))
         return result.fetchall()
 
 # Insert rule in the rules storage table
 def insert_rule(rule_id, rule, table_name, column_name, rule_category, sql_query):
-    query = f"""
-        INSERT INTO rule_storage (rule_id, rule, table_name, column_name, rule_category, sql_query)
-        VALUES ('{rule_id}', '{rule}', '{table_name}', '{column_name}', '{rule_category}', '{sql_query}')
-    """
-    db_rules.run(query)
+    rule_repository.insert_rules([{
+        "rule_id": rule_id, "rule": rule, "table_name": table_name,
+        "column_name": column_name, "rule_category": rule_category, "sql_query": sql_query,
+    }])
     print(f"✅ Rule '{rule_id}' inserted successfully.")
 
+# Get the (cached) profile of all columns of a table
+@timed_stage("get_profile_of_table")
+def get_profile_of_table(table_name, refresh=False):
+    return get_table_profile(engine_source, engine_rules, table_name, catalog_source.table_version(table_name), refresh)
+
 # Get top values from a column
-def get_top_values(table_name: str, column_name: str, db_path=DATA_BASE_PATH_SOURCE, limit: int = 200):
+def get_top_values(table_name: str, column_name: str, db_path=DB_PATH_SOURCE, limit: int = 200):
     query = f"""
         SELECT {column_name}, COUNT(*) AS value_count
         FROM {table_name}
@@ -152,74 +200,96 @@ def get_top_values(table_name: str, column_name: str, db_path=DATA_BASE_PATH_SOU
 
 # Delete rule from the rules storage table
 def delete_rule(rule_id):
-    query = f"DELETE FROM rule_storage WHERE rule_id = '{rule_id}'"
-    db_rules.run(query)
+    rule_repository.delete_rules([rule_id])
     print(f"✅ Rule '{rule_id}' deleted successfully (if it existed).")
 
 # Get existing rules on a column
 def get_existing_rules_on_column(column_name, table_name):
-    query = f"SELECT rule FROM rule_storage WHERE column_name = '{column_name}' AND table_name = '{table_name}'"
-    results = db_rules.run(query)
-    if not results:
-        return []
-    results = ast.literal_eval(results)
-    flat_list = [r[0] for r in results]
-    return flat_list
+    return rule_repository.rules_on_column(table_name, column_name)
 
 # Get all rules for a table
 def get_all_rules_of_table(table_name):
-    query = f"SELECT rule, table_name, column_name, rule_category, sql_query FROM rule_storage WHERE table_name = '{table_name}'"
-    results = db_rules.run(query)
-    # breakpoint()
-    if not results:
-        return []
-    results = ast.literal_eval(results)
-    keys = ["rule", "table_name", "column_name", "rule_category", "sql_query"]
-    # convert each tuple into a dictionary
-    dict_list = [dict(zip(keys, row)) for row in results]
-
-    return dict_list
+    return rule_repository.list_rules(table_name)
+
+# Rewrite stored rule queries into the rowid form, returns the number of rules changed
+def normalize_stored_rules():
+    return rule_repository.normalize_queries()
+
+# Opaque pagination cursor - the last rowid of the previous page
+def encode_page_cursor(row_id):
+    return base64.urlsafe_b64encode(f"rowid:{row_id}".encode()).decode()
+
+def decode_page_cursor(cursor):
+    try:
+        prefix, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        if prefix != "rowid":
+            raise ValueError
+        return int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid page cursor '{cursor}'")
+
+# Keyset pagination on rowid when a cursor is given, OFFSET is only kept for old clients
+def _page_clause(cursor, offset, limit):
+    if cursor:
+        return "WHERE rowid > ? ORDER BY rowid LIMIT ?", (decode_page_cursor(cursor), limit)
+    if offset:
+        return "ORDER BY rowid LIMIT ? OFFSET ?", (limit, offset)
+    return "ORDER BY rowid LIMIT ?", (limit,)
+
+def _next_page_cursor(last_row_id, row_count, limit):
+    return encode_page_cursor(last_row_id) if row_count and row_count == limit else None
 
 # load table and its values - chunk by chunk
-def load_table_values(table_name, offset, limit):
+# Every row also carries its "_rowid", so the UI can jump to rows returned by rules
+def load_table_values(table_name, offset, limit, cursor=None):
+    columns = get_columns_of_table(table_name)
+    if not columns:
+        return None, None, None
+
+    page_clause, params = _page_clause(cursor, offset, limit)
     query = f"""
-    SELECT * 
-    FROM {table_name} 
-    LIMIT {limit} OFFSET {offset}
+    SELECT rowid, * 
+    FROM {quote_identifier(table_name)} 
+    {page_clause}
     """
-    results = db_source.run(query)  # returns list of tuples
-    if not results:
-        return None, None
-    results = ast.literal_eval(results)
-    
-    columns_query = f"PRAGMA table_info({table_name})"  # For SQLite, get column names
-    column_result = db_source.run(columns_query)
-    if not column_result:
-        return None, None
-    column_result = ast.literal_eval(column_result)
-    columns = [col[1] for col in column_result]
-    
-    # Convert to list of dicts
-    data = [dict(zip(columns, row)) for row in results]
+    data = [{"_rowid": row[0], **dict(zip(columns, row[1:]))} for row in iter_rows(engine_source, query, params)]
+    if not data:
+        return None, None, None
+    return columns, data, _next_page_cursor(data[-1]["_rowid"], len(data), limit)
+
+# load specific rows by their rowid (indexed lookup)
+def load_rows_by_rowid(table_name, row_ids):
+    columns = get_columns_of_table(table_name)
+    if not columns or not row_ids:
+        return columns or None, []
+
+    placeholders = ", ".join("?" for _ in row_ids)
+    query = f"""
+    SELECT rowid, *
+    FROM {quote_identifier(table_name)}
+    WHERE rowid IN ({placeholders})
+    ORDER BY rowid
+    """
+    data = [{"_rowid": row[0], **dict(zip(columns, row[1:]))} for row in iter_rows(engine_source, query, row_ids)]
     return columns, data
 
-# load column and values
-def load_col_values(table_name, column_name, offset, limit):
+# load column and values, keyed by rowid
+def load_col_values(table_name, column_name, offset, limit, cursor=None):
+    require_column(table_name, column_name)
+    page_clause, params = _page_clause(cursor, offset, limit)
     query = f"""
-        SELECT {column_name}
-        FROM {table_name}
-        LIMIT {limit} OFFSET {offset}
+        SELECT rowid, {quote_identifier(column_name)}
+        FROM {quote_identifier(table_name)}
+        {page_clause}
     """
-    results = db_source.run(query)
-    if not results:
-        return None
-    
-    results = ast.literal_eval(results)
     values_dict = {}
-    for i, row in enumerate(results):
-        values_dict[offset + i + 1] = row[0]
-    
-    return values_dict
+    row_id = None
+    for row_id, value in iter_rows(engine_source, query, params):
+        values_dict[row_id] = value
+
+    if not values_dict:
+        return None, None
+    return values_dict, _next_page_cursor(row_id, len(values_dict), limit)
 
 # ------------------------------------------ agents and llm calls ---------------------------------------------------
 
@@ -227,44 +297,104 @@ def load_col_values(table_name, column_name, offset, limit):
 def know_all_agent():
 
     # llm bind with tools
-    tools = get_sql_tools(db_source,llm)
+    llm = get_llm()
+    tools = get_chat_tools(db_source,llm)
     llm_with_tools = llm.bind_tools(tools)
 
     # Define class
     class ChatState(TypedDict):
         messages: Annotated[list[BaseMessage], add_messages]
         current_column: str
-
-    # Nodes
-    def chat_node(state: ChatState):
-        
-        prompt_template = PromptTemplate(input_variables=["current_column"], template=col_know_all_prompt_with_rules)
-        system_prompt = prompt_template.format(current_column=state["current_column"])
+        current_table: str
+        summary: str
+        history_stats: dict
+
+    # Nodes - each has a sync version (invoke) and an async one (ainvoke/astream)
+    # History - fold turns older than CHAT_KEEP_TURNS into the running summary (see chat_history.py)
+    def summary_messages(state: ChatState, old_messages):
+        prompt_template = PromptTemplate(input_variables=["current_column", "summary"], template=summarize_chat_prompt)
+        system_prompt = prompt_template.format(current_column=state.get("current_column", ""), summary=state.get("summary") or "(none yet)")
+        return [SystemMessage(content=system_prompt), HumanMessage(content=transcript(old_messages))]
+
+    def summary_update(state: ChatState, old_messages, response, started):
+        return {
+            "summary": response.content.strip(),
+            "messages": [RemoveMessage(id=message.id) for message in old_messages],
+            "history_stats": {"summarized_messages": len(old_messages), "summary_ms": round((time.perf_counter() - started) * 1000, 1)},
+        }
+
+    def history_node(state: ChatState):
+        old_messages = messages_to_summarize(state["messages"])
+        if not old_messages:
+            return {"history_stats": {}}
+        started = time.perf_counter()
+        response = llm.invoke(summary_messages(state, old_messages))
+        return summary_update(state, old_messages, response, started)
+
+    async def ahistory_node(state: ChatState):
+        old_messages = messages_to_summarize(state["messages"])
+        if not old_messages:
+            return {"history_stats": {}}
+        started = time.perf_counter()
+        response = await llm.ainvoke(summary_messages(state, old_messages))
+        return summary_update(state, old_messages, response, started)
+
+    # Chat - system prompt, running summary and as much recent history as fits CHAT_TOKEN_BUDGET
+    def chat_messages(state: ChatState):
+        started = time.perf_counter()
+        profile = get_profile_of_table(state["current_table"]) if state.get("current_table") else None
+        column_profile = format_column_profile(profile, state["current_column"])
+        prompt_template = PromptTemplate(input_variables=["current_column", "column_profile"], template=col_know_all_prompt_with_rules)
+        system_prompt = prompt_template.format(current_column=state["current_column"], column_profile=column_profile)
+        if state.get("summary"):
+            system_prompt += f"\nSummary of the earlier conversation:\n{state['summary']}\n"
         system_message = SystemMessage(content=system_prompt)
-        messages = [system_message] + state["messages"]
+        messages, stats = fit_to_budget(state["messages"], estimate_tokens([system_message]))
+        stats["trim_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return [system_message] + messages, stats
 
+    def chat_update(state: ChatState, response, stats, started):
+        stats = {**(state.get("history_stats") or {}), **stats, "llm_ms": round((time.perf_counter() - started) * 1000, 1)}
+        return {"messages": [response], "history_stats": stats}
+
+    def chat_node(state: ChatState):
+        messages, stats = chat_messages(state)
+        started = time.perf_counter()
         response = llm_with_tools.invoke(messages)
+        return chat_update(state, response, stats, started)
 
-        return {"messages": [response]}
+    async def achat_node(state: ChatState):
+        messages, stats = await asyncio.to_thread(chat_messages, state)
+        started = time.perf_counter()
+        response = await llm_with_tools.ainvoke(messages)
+        return chat_update(state, response, stats, started)
 
     tool_node = ToolNode(tools)
 
     # Graph
     # - Nodes
     graph = StateGraph(ChatState)
-    graph.add_node("chat_node", chat_node)
+    graph.add_node("history", RunnableLambda(history_node, afunc=ahistory_node))
+    graph.add_node("chat_node", RunnableLambda(chat_node, afunc=achat_node))
     graph.add_node("tools", tool_node)
     # - Edges
-    graph.add_edge(START, "chat_node")
+    graph.add_edge(START, "history")
+    graph.add_edge("history", "chat_node")
     graph.add_conditional_edges("chat_node",tools_condition)
     graph.add_edge('tools', 'chat_node')
     # - Compile
-    chatbot = graph.compile(checkpointer=checkpointer)
+    chatbot = graph.compile(checkpointer=checkpointer).with_config(callbacks=[node_metrics])
 
     return chatbot
 
+# State of the rule to SQL agent - the table/column being worked on travel with the request
+class RuleToSqlState(MessagesState):
+    table_name: str
+    column_name: str
+    schema: str
+
 # Agent - Rule to SQL conversion agent
-def rule_to_sql_agent(llm, db, checkpointer, table_name, schema, column_name, generate_query_system_prompt, check_query_system_prompt):
+def rule_to_sql_agent(llm, db, checkpointer, generate_query_system_prompt, check_query_system_prompt):
 
     # Tools
     toolkit = SQLDatabaseToolkit(db=db, llm=llm)
@@ -274,37 +404,51 @@ def rule_to_sql_agent(llm, db, checkpointer, table_name, schema, column_name, ge
     run_query_tool = next(tool for tool in tools if tool.name == "sql_db_query")
     run_query_node = ToolNode([run_query_tool], name="run_query")
 
-    def generate_query(state: MessagesState):
+    generate_llm = llm.bind_tools([run_query_tool])
+    check_llm = llm.bind_tools([run_query_tool], tool_choice="any")
+
+    def generate_query_messages(state: RuleToSqlState):
         prompt_template = PromptTemplate(input_variables=["dialect", "schema", "table_name", "column_name"], template=generate_query_system_prompt)
-        system_prompt = prompt_template.format(dialect=db.dialect, schema=schema, table_name=table_name, column_name=column_name)
+        system_prompt = prompt_template.format(dialect=db.dialect, schema=state["schema"], table_name=state["table_name"], column_name=state["column_name"])
         system_message = SystemMessage(content=system_prompt)
+        return [system_message] + state["messages"]
+
+    def generate_query(state: RuleToSqlState):
+        response = generate_llm.invoke(generate_query_messages(state))
+        return {"messages": [response]}
 
-        llm_with_tools = llm.bind_tools([run_query_tool])
-        response = llm_with_tools.invoke([system_message] + state["messages"])
+    async def agenerate_query(state: RuleToSqlState):
+        response = await generate_llm.ainvoke(generate_query_messages(state))
         return {"messages": [response]}
 
-    def check_query(state: MessagesState):
+    def check_query_messages(state: RuleToSqlState):
         prompt_template = PromptTemplate(input_variables=["dialect"], template=check_query_system_prompt)
         system_prompt = prompt_template.format(dialect=db.dialect)
         system_message = SystemMessage(content=system_prompt)
-        
+
         # Last message contains the generated query
         tool_call = state["messages"][-1].tool_calls[0]
         user_message = {"role": "user", "content": tool_call["args"]["query"]}
-        
-        llm_with_tools = llm.bind_tools([run_query_tool], tool_choice="any")
-        response = llm_with_tools.invoke([system_message, user_message])
+        return [system_message, user_message]
+
+    def check_query(state: RuleToSqlState):
+        response = check_llm.invoke(check_query_messages(state))
+        response.id = state["messages"][-1].id
+        return {"messages": [response]}
+
+    async def acheck_query(state: RuleToSqlState):
+        response = await check_llm.ainvoke(check_query_messages(state))
         response.id = state["messages"][-1].id
         return {"messages": [response]}
 
-    def should_continue(state: MessagesState) -> Literal[END, "check_query"]:
+    def should_continue(state: RuleToSqlState) -> Literal[END, "check_query"]:
         last_message = state["messages"][-1]
         return END if not last_message.tool_calls else "check_query"
 
     # --- 3. Build agent graph ---
-    builder = StateGraph(MessagesState)
-    builder.add_node(generate_query)
-    builder.add_node(check_query)
+    builder = StateGraph(RuleToSqlState)
+    builder.add_node("generate_query", RunnableLambda(generate_query, afunc=agenerate_query))
+    builder.add_node("check_query", RunnableLambda(check_query, afunc=acheck_query))
     builder.add_node(run_query_node, "run_query")
 
     builder.add_edge(START, "generate_query")
@@ -312,30 +456,74 @@ def rule_to_sql_agent(llm, db, checkpointer, table_name, schema, column_name, ge
     builder.add_edge("check_query", "run_query")
     builder.add_edge("run_query", "generate_query")
 
-    agent = builder.compile(checkpointer=checkpointer)
+    agent = builder.compile(checkpointer=checkpointer).with_config(callbacks=[node_metrics])
     return agent
 
-# llm call - Get data quality rule for a specific column
-def get_rule_suggestion_on_column(column_name, table_name, existing_rules):
-
-    llm = get_llm()
-    db = get_db(DB_PATH_SOURCE)
-    schema = get_schema_of_table(table_name, db, llm)
-    values = get_top_values(table_name, column_name, db_path=DB_PATH_SOURCE, limit=200)
+# Everything a rule suggestion needs before the llm call: {"result": ...} on a cache hit, else the prompt and cache key
+@timed_stage("prepare_rule_suggestion")
+def _prepare_rule_suggestion(column_name, table_name, use_cache):
+    schema = get_schema_of_table(table_name)
+    profile = get_profile_of_table(table_name)
+    values = describe_top_values(profile, column_name)
     existing_rules = get_existing_rules_on_column(column_name, table_name)
+
+    cache_key = llm_cache.make_key(
+        "rule_suggestion", table_name, column_name, hash_text(schema),
+        profile["table_version"] if profile else None, sorted(existing_rules), SUGGEST_RULE_PROMPT_VERSION,
+    )
+    if use_cache:
+        cached = llm_cache.get("rule_suggestion", cache_key)
+        if cached is not None:
+            return {"result": cached["suggested_rule"]}
+    else:
+        llm_cache.bypass("rule_suggestion")
+
     prompt_template = PromptTemplate(input_variables=["existing_rules","column","table_name","schema","values"], template=suggest_rule_prompt)
     system_prompt = prompt_template.format(existing_rules=existing_rules, column=column_name, table_name=table_name, schema=schema, values=values)
     system_message = SystemMessage(content=system_prompt)
     user_message = HumanMessage(content=f"Please suggest a data quality rule for this column - {column_name}.")
-    response = llm.invoke([system_message, user_message])
+    return {"messages": [system_message, user_message], "cache_key": cache_key}
+
+def _finish_rule_suggestion(response, cache_key):
     response = response.content.strip()
     # Clean up and enforce the exact format
     if "rule:" in response.lower():
         rule_text = response
+        llm_cache.put("rule_suggestion", cache_key, {"suggested_rule": rule_text})
         return rule_text
     else:
         return None
 
+# llm call - Get data quality rule for a specific column
+# Answers are cached per column, schema, data version, existing rules and prompt version; use_cache=False skips the lookup
+# Identical calls already in flight share one computation (see singleflight.py)
+def get_rule_suggestion_on_column(column_name, table_name, existing_rules, use_cache=True):
+    key = _rule_suggestion_flight_key(column_name, table_name, existing_rules, use_cache)
+    return single_flight.do("rule_suggestion", key, _get_rule_suggestion_on_column, column_name, table_name, use_cache)
+
+async def aget_rule_suggestion_on_column(column_name, table_name, existing_rules, use_cache=True):
+    key = _rule_suggestion_flight_key(column_name, table_name, existing_rules, use_cache)
+    return await single_flight.ado("rule_suggestion", key, _aget_rule_suggestion_on_column, column_name, table_name, use_cache)
+
+# use_cache is part of the key: a use_cache=False caller wants a fresh answer, not one that
+# may have been read from the cache by a call already in flight
+def _rule_suggestion_flight_key(column_name, table_name, existing_rules, use_cache):
+    return ("rule_suggestion", table_name, column_name, tuple(sorted(normalize_whitespace(rule) for rule in existing_rules or [])), use_cache)
+
+def _get_rule_suggestion_on_column(column_name, table_name, use_cache):
+    prepared = _prepare_rule_suggestion(column_name, table_name, use_cache)
+    if "result" in prepared:
+        return prepared["result"]
+    response = get_llm().invoke(prepared["messages"])
+    return _finish_rule_suggestion(response, prepared["cache_key"])
+
+async def _aget_rule_suggestion_on_column(column_name, table_name, use_cache):
+    prepared = await asyncio.to_thread(_prepare_rule_suggestion, column_name, table_name, use_cache)
+    if "result" in prepared:
+        return prepared["result"]
+    response = await get_llm().ainvoke(prepared["messages"])
+    return await asyncio.to_thread(_finish_rule_suggestion, response, prepared["cache_key"])
+
 def get_rule_from_response(llm, get_rule_out_prompt, response):
     system_message = SystemMessage(content=get_rule_out_prompt)
     rule = llm.invoke([system_message]+[response])
@@ -343,38 +531,114 @@ def get_rule_from_response(llm, get_rule_out_prompt, response):
 
 # ---------------------------------------- process agent outputs ----------------------------------------------
 
-def convert_rule_to_sql(rule, table_name, column_name):
-
-    llm = get_llm()
-    db = get_db(DB_PATH_SOURCE)
-    schema = get_schema_of_table(table_name, db, llm)
-    agent = rule_to_sql_agent(llm, db, checkpointer, table_name, schema, column_name, generate_query_system_prompt, check_query_system_prompt)
-    user_input = rule
-    query_ready = True
+# Double-quoted names in a rule query that are neither a column of the table nor a table
+# (SQLite compares identifiers case-insensitively)
+def unknown_identifiers(query, table_name, columns=None):
+    columns = get_columns_of_table(table_name) if columns is None else columns
+    known = {name.lower() for name in list(columns) + catalog_source.list_tables()}
+    return sorted({name for name in quoted_identifiers(query) if name.lower() not in known})
+
+# Check that a rule query compiles against the source database without running it and,
+# given its table, only names that table's columns
+@timed_stage("validate_rule_query")
+def validate_rule_query(query, table_name=None, columns=None):
+    try:
+        fetch_all(engine_source, f"EXPLAIN {query}")
+    except Exception:
+        return False
+    return table_name is None or not unknown_identifiers(query, table_name, columns)
+
+# Compiled rule to SQL graph, built once per prompt version. Conversions are one-shot,
+# so it runs without a checkpointer instead of piling every request into one thread.
+def get_rule_to_sql_agent():
+    return get_shared(
+        ("rule_to_sql_agent", DB_PATH_SOURCE, RULE_TO_SQL_PROMPT_VERSION),
+        lambda: rule_to_sql_agent(get_llm(), db_source, None, generate_query_system_prompt, check_query_system_prompt),
+    )
+
+# Everything a conversion needs before the agent runs: {"result": ...} when the compiler or cache answered, else the agent input
+@timed_stage("prepare_conversion")
+def _prepare_conversion(rule, table_name, column_name, use_cache):
+    columns = get_columns_of_table(table_name)
+    if column_name in columns:
+        column_type = next((col[2] for col in catalog_source.columns(table_name) if col[1] == column_name), None)
+        compiled = compile_rule(rule, table_name, column_name, columns, column_type)
+        if compiled is not None and validate_rule_query(compiled, table_name, columns):
+            return {"result": (True, compiled, "compiler")}
+
+    schema = get_schema_of_table(table_name)
+    cache_key = llm_cache.make_key(
+        "rule_to_sql", normalize_whitespace(rule), table_name, column_name, hash_text(schema), RULE_TO_SQL_PROMPT_VERSION,
+    )
+    if use_cache:
+        cached = llm_cache.get("rule_to_sql", cache_key)
+        if cached is not None:
+            return {"result": (True, cached["sql"], "cache")}
+    else:
+        llm_cache.bypass("rule_to_sql")
 
-    response = agent.invoke({
-        "messages": [HumanMessage(content=user_input)],
-    }, config={"configurable": {"thread_id": "thread_id-1"}})
+    agent_input = {
+        "messages": [HumanMessage(content=rule)],
+        "table_name": table_name,
+        "column_name": column_name,
+        "schema": schema,
+    }
+    return {"agent_input": agent_input, "cache_key": cache_key}
 
+def _finish_conversion(response, table_name, cache_key):
+    query_ready = True
     result = response["messages"][-1].content
 
     # Need something from user to break the loop, like an approval
     if "query:" in result.lower():
         query = result.split(":")[-1].strip()
-        output = query
+        output = normalize_rule_query(query, table_name)
+        unknown = unknown_identifiers(output, table_name)
+        if unknown:
+            # Would compare a string literal instead of a column; ask rather than cache it
+            return False, f"The query refers to {', '.join(unknown)}, which is not a column of '{table_name}'. Which column did you mean?", "agent"
+        llm_cache.put("rule_to_sql", cache_key, {"sql": output})
     elif "question" in result.lower():
         question = result.split(":")[-1].strip()
         output = question
         query_ready = False
 
-    return query_ready, output
+    return query_ready, output, "agent"
+
+# Returns (query_ready, query or question, path) where path is "compiler", "cache" or "agent".
+# Stock rules are compiled locally; only finished queries are cached, clarifying questions always go back to the agent
+# Identical calls already in flight share one computation (see singleflight.py); use_cache is part
+# of the key so a bypass call is never answered from a cached conversion
+def convert_rule_to_sql(rule, table_name, column_name, use_cache=True):
+    key = ("rule_to_sql", table_name, column_name, normalize_whitespace(rule), use_cache)
+    return single_flight.do("rule_to_sql", key, _convert_rule_to_sql, rule, table_name, column_name, use_cache)
+
+async def aconvert_rule_to_sql(rule, table_name, column_name, use_cache=True):
+    key = ("rule_to_sql", table_name, column_name, normalize_whitespace(rule), use_cache)
+    return await single_flight.ado("rule_to_sql", key, _aconvert_rule_to_sql, rule, table_name, column_name, use_cache)
+
+def _convert_rule_to_sql(rule, table_name, column_name, use_cache):
+    prepared = _prepare_conversion(rule, table_name, column_name, use_cache)
+    if "result" in prepared:
+        return prepared["result"]
+    response = get_rule_to_sql_agent().invoke(prepared["agent_input"])
+    return _finish_conversion(response, table_name, prepared["cache_key"])
+
+async def _aconvert_rule_to_sql(rule, table_name, column_name, use_cache):
+    prepared = await asyncio.to_thread(_prepare_conversion, rule, table_name, column_name, use_cache)
+    if "result" in prepared:
+        return prepared["result"]
+    response = await get_rule_to_sql_agent().ainvoke(prepared["agent_input"])
+    return await asyncio.to_thread(_finish_conversion, response, table_name, prepared["cache_key"])
 
 
-chatbot = know_all_agent()
+# Compiled chatbot graph, built on first use so importing utils doesn't construct the LLM client
+def get_chatbot():
+    return get_shared(("chatbot", DB_PATH_SOURCE), know_all_agent)
 
 def call_know_all_agent():
     
-    response = chatbot.invoke({"messages":[HumanMessage(content=user_input)],"current_column":"postcode"},
+    response = get_chatbot().invoke({"messages":[HumanMessage(content=user_input)],"current_column":"postcode"},
                     config={"configurable":{"thread_id":"thread_id-1"}})
     return response["messages"][-1].content
 